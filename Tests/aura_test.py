@@ -0,0 +1,146 @@
+import pytest
+
+from report.data import Event
+from report.queries import Q_EVENTS, Q_AURAS, Q_COMBATANT_INFO
+from report.report import Report
+from report.enums import Encounter
+
+def test_auras_without_loading_events(fake_report, fake_client):
+    at = Event.from_time(32000, 1)
+    active = fake_report.am.active_at(at)
+    queries = {query for query, _ in fake_client.calls}
+    assert Q_EVENTS not in queries
+    assert {Q_AURAS, Q_COMBATANT_INFO} <= queries
+    assert 1 not in fake_report._events
+
+    # the same as from the fight's events
+    loaded = Report('fake', fake_client, Encounter.DSU)
+    loaded.events(1)
+    assert loaded.am.active_at(at) == active
+    assert active == {1: [1000001, 7531], 2: [1000002]}
+
+def test_interval_tree_matches_scan():
+    import random
+    from report.intervals import IntervalTree
+    rng = random.Random(7)
+    intervals = [(s, s + rng.choice([0, 1, 5, 50, float('inf')]), n) for n, s in enumerate(rng.choices(range(100), k=300))]
+    tree = IntervalTree(intervals)
+    for t in range(-1, 160):
+        assert sorted(tree.at(t)) == [n for s, e, n in intervals if s <= t < e]
+
+def old_applied_at(model, event):
+    """applied_at as a scan of every aura event, for comparison"""
+    seen, most_recent = set(), list()
+    for a in model.auras[event.fight].before(event).types(model.APPLIES + model.REMOVES):
+        if (k:=(a.target, a.abilityGameID)) not in seen:
+            seen.add(k)
+            most_recent.append(a)
+    return [e for e in reversed(most_recent) if e.type_ in model.APPLIES]
+
+def test_applied_at_matches_scan(fake_report, fake_client):
+    for fight in fake_client.events.values():
+        # a second apply without a remove, and an apply and remove at the same time
+        fight += [{'timestamp': 12700, 'type': 'applybuff', 'sourceID': 2, 'targetID': 1, 'abilityGameID': 7531, 'fight': 1},
+            {'timestamp': 12700, 'type': 'applydebuff', 'sourceID': 1, 'targetID': 10, 'abilityGameID': 7535, 'fight': 1},
+            {'timestamp': 12700, 'type': 'removedebuff', 'sourceID': 1, 'targetID': 10, 'abilityGameID': 7535, 'fight': 1}]
+        fight.sort(key=lambda e: e['timestamp'])
+    am = fake_report.am
+    for t in range(0, 62000, 100):
+        at = Event.from_time(t, 1)
+        assert list(am.applied_at(at)) == old_applied_at(am, at)
+
+def test_active_at_many(fake_report, fake_client):
+    am = fake_report.am
+    events = [Event.from_time(t, 1) for t in (61000, 0, 32000, 12700, 32000, 15000)]
+    assert am.active_at_many(events) == [am.active_at(e) for e in events]
+    assert am.active_at_many(events, named=True) == [am.active_at(e, named=True) for e in events]
+    assert am.active_at_many([]) == []
+
+def test_coverage(fake_report):
+    pytest.importorskip('numpy')
+    am = fake_report.am
+    coverage = am.coverage(1, ['Rampart', 'Well Fed'], resolution=100)
+    assert coverage.bins == 600
+    assert coverage.uptime('Rampart', 1) == 0.5
+    assert coverage.uptime('Rampart') == {1: 0.5, 2: 0.0}
+    assert coverage.all_covered_uptime('Well Fed') == 1.0
+    assert not coverage.all_covered('Rampart').any()
+    assert coverage.overlap('Well Fed').tolist() == [2] * 600
+
+    # the same as active_at at the start of each bin
+    for b in range(0, 600, 7):
+        active = am.active_at(Event.from_time(1000 + b * 100, 1))
+        assert coverage.covered('Rampart', 1)[b] == (7531 in active.get(1, []))
+
+    # Rampart is on from 1700 to 6700
+    p = coverage.between(1700, 6700)
+    assert (p.start_time, p.bins) == (1700, 50)
+    assert p.uptime('Rampart', 1) == 1.0
+    with pytest.raises(KeyError):
+        coverage.uptime('Kerachole')
+
+def test_gcds_match_scan(fake_report, fake_client):
+    for fight in fake_client.events.values():
+        fight_id = fight[0]['fight']
+        start = fight[0]['timestamp']
+        fight += [{'timestamp': start + t, 'type': 'cast', 'sourceID': 1 + t % 2, 'targetID': 10,
+            'abilityGameID': 7535, 'fight': fight_id} for t in range(0, 60000, 900)]
+        fight.sort(key=lambda e: e['timestamp'])
+    am = fake_report.am
+    applies = am.aura(['Rampart', 'Well Fed'], 1) + am.aura('Rampart', 2)
+    windows = am.gcds_many(applies)
+    assert len(windows) == len(applies) == 2 + 6 + 6
+
+    casts = fake_report.types('cast', [1, 2])
+    for apply, gcds in zip(applies, windows):
+        ends = [a.time for a in am.auras[apply.fight] if (a.target, a.abilityGameID) == (apply.target, apply.abilityGameID) and a.time > apply.time]
+        end = min(ends, default=float('inf'))
+        expected = [c for c in casts if c.fight == apply.fight and c.source == apply.target and apply.time <= c.time < end]
+        expected = [c.to_dict() for c in expected]
+        assert [c.to_dict() for c in gcds] == expected
+        assert [c.to_dict() for c in am.gcds(apply)] == expected
+    # Rampart from 1700 to 6700: Alice casts every 900ms from 1000
+    assert [c.time for c in windows[2]] == [1900, 2800, 3700, 4600, 5500, 6400]
+
+def test_aura_state_checkpoints_match_replay():
+    import random
+    from report.modules.aura import AuraState
+    rng = random.Random(5)
+    types = ['applybuff', 'removebuff', 'applybuffstack', 'removebuffstack', 'refreshbuff', 'applydebuff']
+    events, t = list(), 0
+    for _ in range(400):
+        t += rng.choice([0, 0, 10, 30])
+        events.append(Event({'timestamp': t, 'type': rng.choice(types), 'sourceID': rng.randint(1, 2),
+            'targetID': rng.randint(1, 3), 'abilityGameID': rng.randint(1, 3), 'fight': 1, 'stack': rng.randint(1, 4)}))
+
+    state = AuraState(events, checkpoint=16)
+    for time in range(-10, t + 20, 7):
+        replayed = dict()
+        for e in events:
+            if e.time <= time:
+                AuraState._step(replayed, e)
+        assert state.at(time) == replayed
+
+    with pytest.raises(ValueError):
+        state.feed(Event.from_time(t - 1, 1))
+
+def test_stacks_and_refreshes(fake_report, fake_client):
+    for fight in fake_client.events.values():
+        fight_id = fight[0]['fight']
+        start = fight[0]['timestamp']
+        fight += [
+            {'timestamp': start + 800, 'type': 'applybuffstack', 'sourceID': 1, 'targetID': 1, 'abilityGameID': 7531, 'fight': fight_id, 'stack': 2},
+            {'timestamp': start + 3000, 'type': 'refreshbuff', 'sourceID': 2, 'targetID': 1, 'abilityGameID': 7531, 'fight': fight_id},
+            {'timestamp': start + 4000, 'type': 'removebuffstack', 'sourceID': 1, 'targetID': 1, 'abilityGameID': 7531, 'fight': fight_id, 'stack': 1}]
+        fight.sort(key=lambda e: e['timestamp'])
+    am = fake_report.am
+    assert am.stacks_at(Event.from_time(1600, 1), 1, 7531) == 0
+    assert am.stacks_at(Event.from_time(2000, 1), 1, 7531) == 2
+    aura = am.state_at(Event.from_time(5500, 1))[(1, 7531)]
+    assert (aura.stacks, aura.source, aura.refreshed, aura.applied.time) == (1, 2, 4000, 1700)
+    assert am.stacks_at(Event.from_time(7000, 1), 1, 7531) == 0
+    assert am.state_at(Event.from_time(7000, 1))[(1, 1000001)].stacks == 1
+
+    # stack changes and refreshes don't end the apply's window
+    assert [e.time for e in am.applied_at(Event.from_time(4500, 1)).types('applybuff')] == [1000, 1000, 1700]
+    assert am._window_ends(1)[(1, 7531, 1700)] == 6700
@@ -0,0 +1,48 @@
+"""
+Cost of a cache hit in FFClient.q: the old deepcopy of the cached result against
+returning the shared read-only result, for a page of 10,000 events.
+
+    python -m Tests.bench_cache
+"""
+import sys
+import types
+import timeit
+from copy import deepcopy
+
+from Tests.conftest import make_events
+from report.queries import Q_EVENTS
+
+PAGE = 10_000
+REPEAT = 20
+
+def page() -> dict:
+    events = []
+    while len(events) < PAGE:
+        fight = len(events) // 200 + 1
+        events += make_events({'id': fight, 'startTime': fight * 100_000})
+    events = events[:PAGE]
+    return {'reportData': {'report': {'events': {'data': events, 'nextPageTimestamp': None}}}}
+
+def main() -> None:
+    sys.modules.setdefault('config', types.SimpleNamespace(CLIENT_ID='id', CLIENT_SECRET='secret'))
+    from client.client import FFClient
+    from report.data import Event
+
+    client = FFClient(token='token')
+    client._disk = lambda: types.SimpleNamespace(put=lambda *args: 0, get_sized=lambda *args: None)
+    client._q = lambda query, params, priority=None: page()
+    params = {'reportCode': 'bench', 'startTime': 0}
+    cached = client.q(Q_EVENTS, params)
+
+    copy = timeit.timeit(lambda: deepcopy(cached), number=REPEAT) / REPEAT
+    hit = timeit.timeit(lambda: client.q(Q_EVENTS, params), number=REPEAT) / REPEAT
+    parse = timeit.timeit(lambda: [*map(Event, cached['reportData']['report']['events']['data'])],
+        number=REPEAT) / REPEAT
+
+    print(f'{PAGE} events per page, mean of {REPEAT} runs')
+    print(f'  deepcopy of cached page (old hit): {copy * 1000:9.3f} ms')
+    print(f'  shared read-only page (new hit):   {hit * 1000:9.3f} ms')
+    print(f'  building the Events:               {parse * 1000:9.3f} ms')
+
+if __name__ == '__main__':
+    main()
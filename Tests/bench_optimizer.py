@@ -0,0 +1,60 @@
+"""
+Raid-buff optimizer on synthetic 20 minute fights: 8 players hitting every 2.5s with bursts
+every 2 minutes, 5 phases, and 8 two-minute raid buffs, at 100ms bins.
+
+    python -m Tests.bench_optimizer
+"""
+import random
+import timeit
+
+import numpy as np
+
+from report.modules.optimizer import Buff, BuffOptimizer, DamageProfile
+
+FIGHT = 20 * 60 * 1000
+PULLS = 20
+REPEAT = 3
+BUFFS = {
+    1: [Buff('Divination', 20000, 120000, 0.06)],
+    2: [Buff('Battle Litany', 20000, 120000, 0.10)],
+    3: [Buff('Brotherhood', 20000, 120000, 0.05)],
+    4: [Buff('Embolden', 20000, 120000, 0.05)],
+    5: [Buff('Searing Light', 20000, 120000, 0.03)],
+    6: [Buff('Technical Finish', 20000, 120000, 0.05)],
+    7: [Buff('Radiant Finale', 20000, 110000, 0.06)],
+    8: [Buff('Chain Stratagem', 20000, 120000, 0.10, hold=5000)],
+}
+
+def fight(seed: int) -> tuple[list[int], list[int], list[int]]:
+    """(times, amounts, phase starts) of one pull"""
+    rng = random.Random(seed)
+    times, amounts = list(), list()
+    for player in range(8):
+        t = rng.randint(0, 2500)
+        while t < FIGHT:
+            burst = (t % 120000) < 20000
+            times.append(t)
+            amounts.append(rng.randint(10000, 30000) * (3 if burst else 1))
+            t += rng.randint(2000, 3000)
+    phases = sorted(rng.sample(range(60000, FIGHT, 1000), 4))
+    return times, amounts, phases
+
+def main() -> None:
+    pulls = [fight(seed) for seed in range(PULLS)]
+    optimizer = BuffOptimizer(None)
+
+    def profiles():
+        return [DamageProfile(times, amounts, 0, FIGHT, optimizer.resolution, phases) for times, amounts, phases in pulls]
+
+    built = profiles()
+    profile = timeit.timeit(profiles, number=REPEAT) / REPEAT
+    optimize = timeit.timeit(lambda: [optimizer.optimize(None, BUFFS, p) for p in built], number=REPEAT) / REPEAT
+
+    events = sum(len(times) for times, _, _ in pulls)
+    print(f'{PULLS} pulls of {FIGHT // 60000} minutes, {events} damage events, {len(BUFFS)} buffs, mean of {REPEAT} runs')
+    print(f'  binning and prefix sums:  {profile * 1000:9.3f} ms')
+    print(f'  optimizing every buff:    {optimize * 1000:9.3f} ms')
+    print(f'  per pull:                 {(profile + optimize) / PULLS * 1000:9.3f} ms')
+
+if __name__ == '__main__':
+    main()
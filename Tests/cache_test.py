@@ -0,0 +1,198 @@
+import json
+import sys
+import types
+
+import pytest
+
+from copy import deepcopy
+
+from client.cache import MemoryCache, SqliteCache, freeze
+from report.data import Event
+from report.queries import Q_FIGHTS, Q_EVENTS
+from report.report import Report
+from report.enums import Encounter
+from Tests.conftest import FakeClient, FIGHTS, make_events
+
+pytest.importorskip('gql')
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setitem(sys.modules, 'config', types.SimpleNamespace(CLIENT_ID='id', CLIENT_SECRET='secret'))
+    from client.client import FFClient
+    monkeypatch.setattr(FFClient, 'CACHE_DIR', str(tmp_path))
+    client = FFClient(token='token')
+    client.sent = []
+    def _q(query, params, priority=None):
+        client.sent.append(params)
+        return {'reportData': {'report': {'fights': [{'id': params['fightIDs'][0], 'startTime': 0, 'endTime': 1}]}}}
+    client._q = _q
+    return client
+
+def test_sqlite_cache(tmp_path):
+    cache = SqliteCache(str(tmp_path / 'cache.sqlite3'))
+    cache.put('abc', 'k1', {'a': 1})
+    cache.put_many('abc', {'k2': {'b': 2}, 'k3': {'c': 3}})
+    cache.put('xyz', 'k1', {'z': 0})
+    assert cache.get('abc', 'k1') == {'a': 1}
+    assert cache.get('abc', 'k4') is None
+    assert cache.has('abc', 'k3') and not cache.has('xyz', 'k3')
+    assert sorted(cache.keys('abc')) == ['k1', 'k2', 'k3']
+
+    cache.delete('abc')
+    assert cache.keys('abc') == [] and cache.get('xyz', 'k1') == {'z': 0}
+    cache.close()
+
+    # entries outlive the connection
+    assert SqliteCache(str(tmp_path / 'cache.sqlite3')).get('xyz', 'k1') == {'z': 0}
+
+def test_client_cache_persists(client, tmp_path):
+    params = {'reportCode': 'abc', 'fightIDs': [3]}
+    first = client.q(Q_FIGHTS, params)
+    assert client.q(Q_FIGHTS, params) == first
+    assert len(client.sent) == 1
+
+    # a new client finds it on disk
+    other = type(client)(token='token')
+    other._q = client._q
+    assert other.q(Q_FIGHTS, params) == first
+    assert len(client.sent) == 1
+
+    client.clear_cache()
+    other._memory.delete()
+    other.q(Q_FIGHTS, params)
+    assert len(client.sent) == 2
+
+OLD = {'reportData': {'report': {'fights': []}}}
+
+def test_imports_json_cache_files(client, tmp_path):
+    params = {'reportCode': 'old', 'fightIDs': [5]}
+    key = client._cache_key(Q_FIGHTS, params)
+    with open(tmp_path / 'old.json', 'w') as f:
+        json.dump({json.dumps(params) + Q_FIGHTS: OLD}, f)
+
+    assert client.q(Q_FIGHTS, params) == freeze(OLD)
+    assert client.sent == []
+    assert not (tmp_path / 'old.json').exists()
+    assert client._disk().get('old', key) == OLD
+
+def test_cache_hits_are_shared_and_read_only(client):
+    params = {'reportCode': 'abc', 'fightIDs': [3]}
+    first = client.q(Q_FIGHTS, params)
+    assert client.q(Q_FIGHTS, params) is first
+
+    fights = first['reportData']['report']['fights']
+    assert isinstance(fights, tuple)
+    with pytest.raises(TypeError):
+        fights[0]['id'] = 4
+    with pytest.raises(TypeError):
+        first.pop('reportData')
+    with pytest.raises(TypeError): # equal to a dict, so unhashable like one
+        hash(first)
+
+    # copies can be changed
+    copy = deepcopy(first)
+    copy['reportData']['report']['fights'][0]['id'] = 4
+    assert fights[0]['id'] == 3
+
+def test_event_leaves_data_unchanged():
+    data = freeze({'timestamp': 5, 'type': 'cast', 'sourceID': 1, 'fight': 2,
+        'abilityGameID': 7531, 'melee': True})
+    e = Event(data)
+    assert (e.time, e.type_, e.source, e.target, e.abilityGameID, e.melee) == (5, 'cast', 1, -1, 7531, True)
+    assert e.to_dict() == {'timestamp': 5, 'type': 'cast', 'sourceID': 1, 'targetID': -1, 'fight': 2,
+        'abilityGameID': 7531, 'melee': True}
+    assert len(data) == 6
+
+def test_memory_cache_lru():
+    cache = MemoryCache(max_entries=2, max_bytes=100)
+    cache.put('abc', 'k1', 1, 10)
+    cache.put('abc', 'k2', 2, 10)
+    assert cache.get('abc', 'k1') == 1 # k2 is now least recent
+    cache.put('abc', 'k3', 3, 10)
+    assert cache.get('abc', 'k2') is None
+    assert cache.get('abc', 'k3') == 3
+
+    cache.put('xyz', 'big', 4, 95) # over the byte budget with k1 and k3
+    assert len(cache) == 1 and cache.get('xyz', 'big') == 4
+    assert cache.stats() | {'max_entries': None, 'max_bytes': None} == {
+        'hits': 3, 'misses': 1, 'evictions': 3, 'entries': 1, 'resident_bytes': 95,
+        'max_entries': None, 'max_bytes': None}
+
+def test_evicted_entries_come_from_disk(client):
+    client._memory.max_entries = 1
+    a = {'reportCode': 'abc', 'fightIDs': [1]}
+    b = {'reportCode': 'abc', 'fightIDs': [2]}
+    client.q(Q_FIGHTS, a)
+    client.q(Q_FIGHTS, b) # evicts a
+    assert client.q(Q_FIGHTS, a)['reportData']['report']['fights'][0]['id'] == 1
+    assert len(client.sent) == 2
+
+    stats = client.cache_stats()
+    assert (stats['evictions'], stats['disk_hits'], stats['entries']) == (2, 1, 1)
+    assert stats['resident_bytes'] == len(json.dumps(client.q(Q_FIGHTS, a)))
+
+def test_canonical_keys(client):
+    a = client._cache_key(Q_EVENTS, {'reportCode': 'abc', 'fightIDs': [2, 1], 'startTime': 5.0, 'filter': ''})
+    b = client._cache_key('  ' + Q_EVENTS, {'startTime': 5, 'fightIDs': [1, 2], 'reportCode': 'abc'})
+    assert a == b
+
+def test_filtered_events_from_cached_fights(client):
+    fake = FakeClient()
+    client._q = lambda query, params, priority=None: fake.q(query, params)
+    report = Report('fake', client, Encounter.DSU)
+    report.events(1)
+
+    def events(expression: str, fight_ids: list[int]) -> list[dict]:
+        res = client.q(Q_EVENTS, {'reportCode': 'fake', 'encounterID': Encounter.DSU.value,
+            'startTime': 1000, 'endTime': 160000, 'filter': expression, 'fightIDs': fight_ids})
+        return res['reportData']['report']['events']['data']
+
+    fake.calls.clear()
+    casts = events('type="cast" AND ability.name="Ascalon\'s Might"', [1])
+    assert fake.calls == []
+    expected = [e for e in make_events(FIGHTS[0]) if e['type'] == 'cast' and e['abilityGameID'] == 25862]
+    assert list(casts) == expected
+    # the report's cached keys were read once; later queries use the page index
+    client._disk().keys = lambda report_code: pytest.fail('cached keys read again')
+    assert len(events("type in ('cast', 'begincast') AND source.id = 11", [1])) == 30
+    assert client.cache_stats()['subsumed'] == 2
+
+    # fight 2 isn't cached, and the server is needed for filters it can't run
+    events('type="cast"', [1, 2])
+    events("source.name = 'Thordan'", [1])
+    assert [params.get('filter') for _, params in fake.calls] == ['type="cast"', "source.name = 'Thordan'"]
+
+def test_compile_filter_uses_the_filter_grammar():
+    from client.subsume import compile_filter
+    names = {'X and Y': {7}, 'Z': {8}}.get
+    raw = [{'type': 'cast', 'abilityGameID': 7, 'sourceID': 1, 'fight': 1, 'timestamp': 10},
+        {'type': 'cast', 'abilityGameID': 8, 'sourceID': 2, 'fight': 1, 'timestamp': 20},
+        {'type': 'death', 'sourceID': -1, 'targetID': 10, 'fight': 1, 'timestamp': 30}]
+    def matching(expression):
+        return [e['timestamp'] for e in filter(compile_filter(expression, names), raw)]
+
+    # AND inside quotes is part of the name
+    assert matching('ability.name = "X and Y"') == [10]
+    assert matching("type = 'cast' and (source.id = 2 OR NOT ability.id in (7, 8))") == [20]
+    assert matching("inCategory('deaths') = true OR timestamp < 15") == [10, 30]
+    assert matching("abilityGameID != 7") == [20, 30]
+    assert compile_filter("ability.name = 'unknown'", names) is None
+    assert compile_filter("source.name = 'Thordan'", names) is None
+    assert compile_filter("type = ", names) is None
+    assert compile_filter("encounterPhase = 2", names) is None
+
+def test_filtered_events_from_cached_windows(client):
+    fake = FakeClient()
+    client._q = lambda query, params, priority=None: fake.q(query, params)
+    client.CONCURRENT = True # windows as AsyncFFClient fetches them
+    report = Report('fake', client, Encounter.DSU, windowed=True)
+    report.WINDOW_EVENTS = 40
+    report.events(1)
+    report.events(2) # fetched in windows
+
+    fake.calls.clear()
+    res = client.q(Q_EVENTS, {'reportCode': 'fake', 'encounterID': Encounter.DSU.value,
+        'startTime': 1000, 'endTime': 160000, 'filter': "type = 'damage'", 'fightIDs': [2]})
+    assert fake.calls == []
+    assert list(res['reportData']['report']['events']['data']) == [
+        e for e in make_events(FIGHTS[1]) if e['type'] == 'damage']
@@ -0,0 +1,122 @@
+import asyncio
+import re
+import sys
+import threading
+import types
+
+import pytest
+
+from report.queries import Q_MASTER_DATA, Q_FIGHTS, Q_EVENTS
+from report.enums import Encounter
+from Tests.conftest import FakeClient
+
+aiohttp = pytest.importorskip('aiohttp')
+pytest.importorskip('gql')
+from aiohttp import web
+
+QUERIES = {'MasterData': Q_MASTER_DATA, 'Fights': Q_FIGHTS, 'Events': Q_EVENTS}
+
+class StandInServer:
+    """Local GraphQL endpoint answering from FakeClient, recording concurrency"""
+    DELAY = 0.02 # seconds per request
+
+    def __init__(self) -> None:
+        self.data = FakeClient()
+        self.requests = 0
+        self.active = 0
+        self.max_active = 0
+        self.url = None
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+
+    async def handle(self, request):
+        body = await request.json()
+        self.requests += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.DELAY)
+            name = re.search(r'query (\w+)', body['query']).group(1)
+            data = self.data.q(QUERIES[name], body.get('variables') or {})
+            data['rateLimitData'] = {'limitPerHour': 3600, 'pointsSpentThisHour': self.requests}
+            return web.json_response({'data': data})
+        finally:
+            self.active -= 1
+
+    async def _start(self) -> None:
+        app = web.Application()
+        app.router.add_post('/api/v2/client', self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f'http://127.0.0.1:{port}/api/v2/client'
+
+    def start(self) -> None:
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+
+    def stop(self) -> None:
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+@pytest.fixture
+def server():
+    server = StandInServer()
+    server.start()
+    yield server
+    server.stop()
+
+@pytest.fixture
+def async_client(server, monkeypatch, tmp_path):
+    # credentials are unused by the stand-in server
+    monkeypatch.setitem(sys.modules, 'config', types.SimpleNamespace(CLIENT_ID='id', CLIENT_SECRET='secret'))
+    from client.async_client import AsyncFFClient
+    monkeypatch.setattr(AsyncFFClient, 'CACHE_DIR', str(tmp_path))
+    with AsyncFFClient(url=server.url, token='token', max_concurrency=4) as client:
+        yield client
+
+def events_request(fight_id: int) -> tuple[str, dict]:
+    fight = FakeClient().q(Q_FIGHTS, {'fightIDs': [fight_id]})['reportData']['report']['fights'][0]
+    return Q_EVENTS, {'reportCode': 'fake', 'encounterID': 1065,
+        'startTime': fight['startTime'], 'endTime': fight['endTime'], 'fightIDs': [fight_id]}
+
+def test_async_client_concurrency_and_cache(server, async_client):
+    requests = [events_request(1), events_request(2)] * 3 + [
+        (Q_FIGHTS, {'reportCode': 'fake', 'fightIDs': [i]}) for i in range(1, 7)]
+    results = async_client.q_many(requests)
+
+    assert [r['reportData']['report']['events']['data'][0]['fight'] for r in results[:2]] == [1, 2]
+    assert results[0] == results[2]
+    # equal requests in flight at the same time are sent once
+    assert server.requests == 2 + 6
+    assert 1 < server.max_active <= 4
+
+    again = async_client.q(*events_request(1))
+    assert again == results[0]
+    assert server.requests == 8
+
+def test_async_client_fetches_token(server, monkeypatch, tmp_path):
+    monkeypatch.setitem(sys.modules, 'config', types.SimpleNamespace(CLIENT_ID='id', CLIENT_SECRET='secret'))
+    import client.client
+    from client.async_client import AsyncFFClient
+    tokens = iter(['first', 'second'])
+    monkeypatch.setattr(client.client.OAuth2Session, 'fetch_token', lambda self, *args, **kwargs: {'access_token': next(tokens)})
+    monkeypatch.setattr(AsyncFFClient, 'CACHE_DIR', str(tmp_path))
+
+    with AsyncFFClient(url=server.url) as async_client:
+        assert async_client._transport.headers == {'Authorization': 'Bearer first'}
+        async_client.q(*events_request(1))
+        async_client.refresh_token()
+        assert async_client._async_transport.headers == {'Authorization': 'Bearer second'}
+
+def test_report_loads_fights_concurrently(server, async_client):
+    from report.report import Report
+    report = Report('fake', async_client, Encounter.DSU)
+    events = report.events()
+
+    assert len(events) == sum(len(e) for e in FakeClient().events.values())
+    assert server.max_active == 2
+    assert list(report.events(2).casts('Ancient Quaga'))
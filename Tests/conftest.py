@@ -0,0 +1,141 @@
+import pytest
+import re
+
+from report.queries import Q_MASTER_DATA, Q_FIGHTS, Q_EVENTS, Q_AURAS, Q_COMBATANT_INFO
+from report.report import Report
+from report.enums import Encounter
+from report.modules.phases import Q_TIMELINE
+
+ACTORS = [
+    {'id': 1, 'gameID': 0, 'name': 'Alice', 'type': 'Player', 'subType': 'Paladin'},
+    {'id': 2, 'gameID': 0, 'name': 'Bob', 'type': 'Player', 'subType': 'Sage'},
+    {'id': 10, 'gameID': 12601, 'name': 'Thordan', 'type': 'NPC', 'subType': 'Boss'},
+    {'id': 11, 'gameID': 12612, 'name': 'Nidhogg', 'type': 'NPC', 'subType': 'Boss'},
+]
+
+ABILITIES = [
+    {'gameID': 7531, 'name': 'Rampart'},
+    {'gameID': 7535, 'name': 'Reprisal'},
+    {'gameID': 25862, 'name': "Ascalon's Might"},
+    {'gameID': 25865, 'name': 'Ancient Quaga'},
+    {'gameID': 1000001, 'name': 'Well Fed'},
+    {'gameID': 1000002, 'name': 'Well Fed'},
+]
+
+FIGHTS = [
+    {'id': 1, 'encounterID': 1065, 'startTime': 1000, 'endTime': 61000, 'fightPercentage': 90.0,
+        'lastPhaseAsAbsoluteIndex': 0, 'friendlyPlayers': [1, 2]},
+    {'id': 2, 'encounterID': 1065, 'startTime': 100000, 'endTime': 160000, 'fightPercentage': 80.0,
+        'lastPhaseAsAbsoluteIndex': 0, 'friendlyPlayers': [1, 2]},
+]
+
+def make_events(fight: dict) -> list[dict]:
+    """Deterministic events for a fight: boss casts, player mitigation and damage"""
+    start = fight['startTime']
+    events = [{'timestamp': start, 'type': 'combatantinfo', 'sourceID': i, 'targetID': -1, 'fight': fight['id'],
+        'auras': [{'source': i, 'ability': 1000000 + i, 'stacks': 1, 'icon': '', 'name': 'Food'}]} for i in (1, 2)]
+    for i in range(0, 60):
+        t = start + i * 1000
+        events.append({'timestamp': t, 'type': 'begincast', 'sourceID': 10, 'targetID': 1,
+            'abilityGameID': 25862, 'fight': fight['id'], 'duration': 700})
+        events.append({'timestamp': t + 500, 'type': 'cast', 'sourceID': 10 + i % 2, 'targetID': 1 + i % 2,
+            'abilityGameID': 25862 if i % 3 else 25865, 'fight': fight['id']})
+        events.append({'timestamp': t + 500, 'type': 'damage', 'sourceID': 1 + i % 2, 'targetID': 10,
+            'abilityGameID': 7531 + 4 * (i % 2), 'fight': fight['id'], 'amount': 1000 + i, 'hitType': 1})
+        if i % 10 == 0:
+            events.append({'timestamp': t + 700, 'type': 'applybuff', 'sourceID': 1, 'targetID': 1,
+                'abilityGameID': 7531, 'fight': fight['id']})
+        if i % 10 == 5:
+            events.append({'timestamp': t + 700, 'type': 'removebuff', 'sourceID': 1, 'targetID': 1,
+                'abilityGameID': 7531, 'fight': fight['id']})
+    return events
+
+_TERM = re.compile(r'''\s*([\w.]+(?:\('\w+'\))?)\s*(!=|=)\s*("[^"]*"|'[^']*'|\w+)\s*$''')
+_ACTOR_FIELDS = {'id': 'id', 'name': 'name', 'type': 'type', 'class': 'subType'}
+_DISPOSITIONS = {'Player': 'friendly', 'NPC': 'enemy'}
+
+def fake_filter(expression: str, event: dict) -> bool:
+    """
+    Whether a raw event matches a filter, as the server would answer for the data above.
+    Only equalities joined by AND; raises NotImplementedError for anything else
+    """
+    for term in re.split(r'\s+AND\s+', expression, flags=re.IGNORECASE):
+        if (m:=_TERM.match(term)) is None:
+            raise NotImplementedError(f'Fake server filter: {term!r}')
+        field, op, value = m.groups()
+        value = value.strip('\'"')
+        actor, _, prop = field.partition('.')
+        if field == 'type':
+            actual = event['type']
+        elif field == "inCategory('deaths')":
+            actual, value = str(event['type'] == 'death').lower(), value.lower()
+        elif field == 'ability.name':
+            actual = next((a['name'] for a in ABILITIES if a['gameID'] == event.get('abilityGameID')), None)
+        elif actor in ('source', 'target') and prop in (*_ACTOR_FIELDS, 'disposition'):
+            found = next((a for a in ACTORS if a['id'] == event.get(f'{actor}ID')), {})
+            actual = _DISPOSITIONS.get(found.get('type')) if prop == 'disposition' else found.get(_ACTOR_FIELDS[prop])
+            actual = None if actual is None else str(actual)
+        else:
+            raise NotImplementedError(f'Fake server filter field: {field!r}')
+        if (actual == value) != (op == '='):
+            return False
+    return True
+
+class FakeClient:
+    """Stand-in for FFClient that answers queries from the data above"""
+    PAGE_SIZE = 50
+    CONCURRENT = False # q_many is a loop, as in FFClient
+
+    def __init__(self) -> None:
+        self.calls = []
+        self.events = {f['id']: make_events(f) for f in FIGHTS}
+
+    def q(self, query: str, params: dict, *, cache: bool=True, **kwargs) -> dict:
+        self.calls.append((query, params))
+        if query is Q_MASTER_DATA:
+            return {'reportData': {'report': {
+                'title': 'test', 'owner': {'id': 0, 'name': 'owner'}, 'guild': None,
+                'startTime': 0, 'endTime': 200000,
+                'masterData': {'actors': ACTORS, 'abilities': ABILITIES}}}}
+        if query is Q_FIGHTS:
+            fight_ids = params.get('fightIDs')
+            fights = [f for f in FIGHTS if not fight_ids or f['id'] in fight_ids]
+            return {'reportData': {'report': {'fights': fights}}}
+        if query is Q_EVENTS:
+            page = self._page(params)
+            if params.get('filter'):
+                page['data'] = [e for e in page['data'] if fake_filter(params['filter'], e)]
+            return {'reportData': {'report': {'events': page}}}
+        if query is Q_AURAS:
+            types = ('applybuff', 'applydebuff', 'removebuff', 'removedebuff', 'applybuffstack', 'applydebuffstack',
+                'removebuffstack', 'removedebuffstack', 'refreshbuff', 'refreshdebuff')
+            return {'reportData': {'report': {'auras': self._page(params, types)}}}
+        if query is Q_TIMELINE:
+            everything = params | {'fightIDs': list(self.events)}
+            return {'reportData': {'report': {
+                'deaths': self._page(everything, ('death',)),
+                'targetable': self._page(everything, ('targetabilityupdate',))}}}
+        if query is Q_COMBATANT_INFO:
+            info = self._page(params, ('combatantinfo',))
+            return {'reportData': {'report': {'info': {'data': info['data']}}}}
+        raise NotImplementedError(query)
+
+    def q_many(self, requests: list[tuple[str, dict]], *, cache: bool=True, **kwargs) -> list[dict]:
+        return [self.q(query, params, cache=cache, **kwargs) for query, params in requests]
+
+    def _page(self, params: dict, types: tuple[str]=None) -> dict:
+        data = [e for fight_id in params['fightIDs'] for e in self.events[fight_id]
+            if params['startTime'] <= e['timestamp'] <= params['endTime'] and (types is None or e['type'] in types)]
+        if len(data) <= self.PAGE_SIZE:
+            return {'data': [dict(e) for e in data], 'nextPageTimestamp': None}
+        next_page = data[self.PAGE_SIZE]['timestamp']
+        page = [dict(e) for e in data[:self.PAGE_SIZE] if e['timestamp'] < next_page]
+        return {'data': page, 'nextPageTimestamp': next_page}
+
+@pytest.fixture
+def fake_client():
+    return FakeClient()
+
+@pytest.fixture
+def fake_report(fake_client):
+    return Report('fake', fake_client, Encounter.DSU)
@@ -0,0 +1,221 @@
+import pytest
+
+from report.data import Event, EventList
+
+def times(events):
+    return [e.time for e in events]
+
+def test_columnar_matches_list(fake_report):
+    pytest.importorskip('numpy')
+    events = fake_report.events(1)
+    columnar = events.to_columnar()
+
+    assert len(columnar) == len(events)
+    assert times(columnar.types('cast')) == times(events.types('cast'))
+    assert times(columnar.ability("Ascalon's Might")) == times(events.ability("Ascalon's Might"))
+    assert times(columnar.casts('Ancient Quaga')) == times(events.casts('Ancient Quaga'))
+    assert times(columnar.by_id(11)) == times(events.by_id(11))
+    assert times(columnar.to('Bob')) == times(events.to('Bob'))
+    assert times(columnar.by_npcs().types('cast')) == times(events.by_npcs().types('cast'))
+    assert columnar.types('damage').to_sources() == events.types('damage').to_sources()
+
+    middle = events[len(events)//2]
+    assert times(columnar.before(middle)) == times(events.before(middle))
+    assert times(columnar.after(middle)) == times(events.after(middle))
+
+def test_columns_from_dicts_and_events(fake_client):
+    pytest.importorskip('numpy')
+    from report.columnar import EventColumns
+    raw = fake_client.events[1]
+    mixed = [Event(e) if i % 2 else e for i, e in enumerate(raw)]
+    a, b = EventColumns(raw), EventColumns(mixed)
+    for name in ['type_', *EventColumns.COLUMNS]:
+        assert getattr(a, name).tolist() == getattr(b, name).tolist()
+    assert a.type_names == b.type_names
+    assert b._events[1] is mixed[1] and b._events[0] is None
+
+def test_columnar_rows_materialize_lazily(fake_client):
+    pytest.importorskip('numpy')
+    from report.report import Report
+    from report.enums import Encounter
+    report = Report('fake', fake_client, Encounter.DSU, columnar=True)
+    events = report.events(1)
+
+    assert all(e is None for e in events._cols._events)
+    casts = events.types('cast')
+    assert all(e is None for e in events._cols._events)
+
+    first = casts[0]
+    assert isinstance(first, Event)
+    assert first.type_ == 'cast'
+    assert casts[0] is first
+
+def test_lazy_plan_fuses_and_reorders(fake_report):
+    events = fake_report.events(1)
+    chain = events.filter(lambda e: e.time % 1000 == 500).by_npcs().types('cast').ability("Ascalon's Might")
+
+    assert chain._result is None
+    steps = chain.explain().splitlines()[1:]
+    assert [s.split('. ')[1].split('(')[0] for s in steps] == ['types', 'ability', 'by_npcs', 'filter']
+
+    expected = [e for e in events if e.type_ == 'cast' and e.abilityGameID == 25862 and e.source in (10, 11)]
+    assert list(chain) == expected
+    assert len(chain) == len(expected)
+    assert chain[0] is expected[0]
+
+def test_lazy_plan_after_reorder(fake_report):
+    casts = fake_report.events(1).types('cast')
+    casts.sort_time(reverse=True)
+    assert times(casts.by_id(10)) == sorted(times(casts.by_id(10)), reverse=True)
+
+def test_index_answers_keyed_filters(fake_report):
+    events = fake_report.events(1)
+    assert events._index is not None
+
+    casts = events.casts('Ancient Quaga').to('Alice')
+    assert casts.explain().count('[index]') == 3
+    scanned = [e for e in events.to_list()
+        if e.type_ == 'cast' and getattr(e, 'abilityGameID', None) == 25865 and e.target == 1]
+    assert list(casts) == scanned
+
+    events.sort_time()
+    assert events._index is None
+    assert list(events.casts('Ancient Quaga').to('Alice')) == scanned
+
+def test_sorted_windows(fake_report):
+    events = fake_report.events(1)
+    assert events.is_sorted()
+
+    t0, t1 = events[10].time, events[40].time
+    window = events.between(t0, t1)
+    assert '[bisect]' in window.explain()
+    assert list(window) == [e for e in events.to_list() if t0 <= e.time <= t1]
+    assert list(events.casts("Ascalon's Might").after(events[10])) == \
+        [e for e in events.to_list() if e.time >= t0 and e.type_ == 'cast' and e.abilityGameID == 25862]
+
+    late = fake_report.events(2)
+    assert (events + late).is_sorted()
+    assert (late + events)._sorted is False
+
+    reversed(window)
+    assert not window.is_sorted()
+    assert list(window.before(events[20])) == [e for e in window if e.time <= events[20].time]
+
+def test_reorder_unresolved_lazy(fake_report):
+    events = fake_report.events(1)
+    assert events.is_sorted()
+    mid = events[len(events) // 2]
+
+    casts = events.types('cast')
+    assert casts._result is None
+    reversed(casts)
+    assert not casts.is_sorted()
+    assert list(casts.before(mid)) == [e for e in casts if e.time <= mid.time]
+
+    casts = events.types('cast')
+    casts[0] = casts[-1]
+    assert not casts.is_sorted()
+    assert list(casts.after(mid)) == [e for e in casts if e.time >= mid.time]
+
+def test_columnar_between(fake_report):
+    pytest.importorskip('numpy')
+    events = fake_report.events(1)
+    columnar = events.to_columnar()
+    t0, t1 = events[10].time, events[40].time
+    assert columnar.is_sorted()
+    assert times(columnar.between(t0, t1)) == times(events.between(t0, t1))
+    assert times(reversed(columnar).between(t0, t1)) == times(reversed(events).between(t0, t1))
+
+def test_slotted_event():
+    import copy
+    data = {'timestamp': 5, 'type': 'combatantinfo', 'sourceID': 1, 'fight': 3,
+        'abilityGameID': 7531, 'auras': [{'ability': 7531, 'stacks': 1}]}
+    event = Event(dict(data))
+
+    assert not hasattr(event, '__dict__')
+    assert event.target == -1
+    assert event.abilityGameID == 7531
+    assert event.auras == data['auras']
+    assert not hasattr(event, 'amount')
+    assert not hasattr(event, 'sourceInstance')
+
+    event.fighttime = 2
+    assert event.fighttime == 2
+    assert event.to_dict() == {'timestamp': 5, 'type': 'combatantinfo', 'sourceID': 1, 'targetID': -1,
+        'fight': 3, 'abilityGameID': 7531, 'auras': data['auras'], 'fighttime': 2}
+    assert copy.deepcopy(event).to_dict() == event.to_dict()
+
+def test_event_memory():
+    import tracemalloc
+    resources = {'hitPoints': 100, 'maxHitPoints': 100, 'mp': 10000, 'maxMP': 10000, 'x': 100, 'y': 100, 'facing': 0}
+    raw = [{'timestamp': 1000 + i, 'type': 'damage', 'sourceID': 1, 'targetID': 10, 'abilityGameID': 7531,
+        'fight': 1, 'hitType': 1, 'amount': 12000, 'unmitigatedAmount': 12000, 'multiplier': 1.0,
+        'packetID': i, 'sourceResources': resources, 'targetResources': resources, 'absorbed': 0,
+        'directHit': False} for i in range(5000)]
+
+    class DictEvent:
+        """Events as they were before slots: every key copied into __dict__"""
+        def __init__(self, data):
+            self.time, self.type_, self.source, self.target, self.fight = \
+                data['timestamp'], data['type'], data['sourceID'], data['targetID'], data['fight']
+            self.__dict__.update(data)
+
+    def size(cls):
+        tracemalloc.start()
+        events = [cls(e) for e in raw]
+        allocated, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return allocated
+
+    # a realistic damage event needs no overflow dict
+    assert Event(raw[0])._extra is None
+    assert size(Event) < size(DictEvent)
+
+def test_named_view(fake_report):
+    events = fake_report.events(1)
+    casts = events.types('cast')
+    named = casts.named()
+
+    first = named[0]
+    assert first.event is casts[0]
+    assert first.source == 'Thordan'
+    assert first.target == 'Alice'
+    assert first.abilityGameID == 'Ancient Quaga'
+    assert first.fighttime == 500
+    assert named.target_names() == named.to_targets() == [e.target for e in named]
+    assert named.by_id(11).to_targets() == ['Bob'] * len(casts.by_id(11))
+    late = named.filter(lambda e: e.fighttime > 1000 and e.target == 'Alice')
+    assert len(late) > 0
+    assert [e.event for e in late] == [e for e in casts if e.time - 1000 > 1000 and e.target == 1]
+
+    named.sort_time(reverse=True)
+    assert named[0].time > named[-1].time
+    assert events.is_sorted() and casts[0] is first.event
+    assert len(named + events.types('damage').named()) == len(casts) + len(events.types('damage'))
+
+def test_merge(fake_report):
+    events = fake_report.events(1)
+    casts, damage = events.types('cast'), events.types('damage')
+    merged = EventList.merge(damage, casts)
+    assert merged.is_sorted()
+    assert list(merged) == sorted(damage.to_list() + casts.to_list(), key=lambda e: e.time)
+
+    named = EventList.merge(casts.named(), damage)
+    assert named[0].source == 'Thordan'
+
+def test_report_wide_chain(fake_report):
+    chained = fake_report.events()
+    one, two = fake_report.events(1), fake_report.events(2)
+    assert chained._parts == [one, two]
+    assert len(chained) == len(one) + len(two)
+    assert chained[len(one)] is two[0]
+    assert chained[-1] is two[-1]
+    assert chained.is_sorted()
+
+    casts = chained.casts('Ancient Quaga')
+    assert list(casts) == list(one.casts('Ancient Quaga')) + list(two.casts('Ancient Quaga'))
+    assert casts.explain().count('[index]') == 4
+
+    chained.sort_time(reverse=True)
+    assert chained[0].time == two[-1].time
+    assert one.is_sorted() and fake_report.events(1)[0] is one[0]
@@ -0,0 +1,62 @@
+import pytest
+
+from report.filters import Filter, FilterError, parse
+
+def times(events):
+    return [e.time for e in events]
+
+def test_parse():
+    tree = parse("type = 'cast' AND (ability.name in ('A', \"B\") OR NOT amount >= 10.5) AND inCategory('deaths')")
+    assert str(tree) == "type = 'cast' AND (ability.name in ('A', 'B') OR NOT (amount >= 10.5)) AND inCategory('deaths') = True"
+    for bad in ("type = ", "type == 'cast'", "type = 'cast' AND", "(type = 'cast'", "type ~ 1"):
+        with pytest.raises(FilterError):
+            parse(bad)
+
+def test_unsupported_filters(fake_report):
+    for expression in ("unknown() = true", "inCategory('fishing') = true", "ability.name < 'A'",
+        "source.disposition = 'friendly'", "source.class = 'Paladin'", "encounterPhase = 2", "isBuff = true"):
+        with pytest.raises(FilterError):
+            Filter(expression, fake_report)
+
+@pytest.mark.parametrize('expression, expected', [
+    ('type="cast" AND ability.name="Ascalon\'s Might"',
+        lambda e: e.type_ == 'cast' and e.abilityGameID == 25862),
+    ("type in ('cast', 'begincast') AND source.id != 10",
+        lambda e: e.type_ in ('cast', 'begincast') and e.source != 10),
+    ("(type = 'damage' AND amount >= 1030) OR NOT source.type = 'Player'",
+        lambda e: (e.type_ == 'damage' and e.amount >= 1030) or e.source not in (1, 2)),
+    ("inCategory('auras') = true AND target.name = 'Alice' AND timestamp > 20000.5",
+        lambda e: e.type_ in ('applybuff', 'removebuff') and e.target == 1 and e.time > 20000),
+    ("NOT (hitType = 1 OR duration < 700) AND target.type = 'Player'",
+        lambda e: not (getattr(e, 'hitType', None) == 1) and e.target in (1, 2)),
+])
+def test_matches_python(fake_report, expression, expected):
+    events = fake_report.events(1)
+    want = [e for e in events if expected(e)]
+    assert want
+    assert list(events.where(expression)) == want
+    assert times(events.to_columnar().where(expression)) == times(want)
+
+def test_plan_uses_index(fake_report):
+    events = fake_report.events(1)
+    assert events.is_sorted()
+    plan = events.where("type = 'cast' AND timestamp <= 30000 AND amount > 0").explain().splitlines()
+    assert plan[1:] == ['  1. where("type = \'cast\'") [index]', "  2. where('timestamp <= 30000') [bisect]",
+        "  3. where('amount > 0')"]
+
+def test_report_filter_runs_locally(fake_report, fake_client):
+    fake_report.events(1)
+    fake_client.calls.clear()
+    casts = fake_report.casts("Ascalon's Might", 1)
+    deaths = fake_report.deaths(1)
+    assert fake_client.calls == []
+    assert times(casts) == times(fake_report.events(1).casts("Ascalon's Might"))
+    assert len(deaths) == 0
+
+    # fight 2 isn't loaded and unsupported filters go to the server
+    fake_report.casts("Ascalon's Might", [1, 2])
+    fake_report.filter("source.class = 'Paladin'", 1)
+    assert len(fake_client.calls) >= 2
+    assert len(fake_report.dummy_downs()) == 0 # disposition is answered by the server, with no Damage Down
+    with pytest.raises(NotImplementedError, match='encounterPhase'): # from the fake server
+        fake_report.filter("type = 'cast' AND encounterPhase = 2", 1)
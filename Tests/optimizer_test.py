@@ -0,0 +1,53 @@
+import random
+from itertools import combinations
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from report.modules.optimizer import Buff, BuffOptimizer, DamageProfile, best_uses
+
+def brute_force(values, cooldown, hold=None):
+    """Best total over every set of uses that keeps the constraints"""
+    n = len(values)
+    best = 0
+    for k in range(1, n // cooldown + 2):
+        for uses in combinations(range(n), k):
+            gaps = [b - a for a, b in zip(uses, uses[1:])]
+            if any(g < cooldown for g in gaps):
+                continue
+            if hold is not None and (uses[0] > hold or any(g > cooldown + hold for g in gaps)):
+                continue
+            best = max(best, sum(values[i] for i in uses))
+    return best
+
+def test_best_uses_matches_brute_force():
+    rng = random.Random(3)
+    for _ in range(200):
+        values = [rng.choice([0, 0, 1, 2, 5, 9]) for _ in range(rng.randint(0, 11))]
+        cooldown = rng.randint(1, 4)
+        hold = rng.choice([None, 0, 1, 3])
+        total, uses = best_uses(np.array(values, dtype=float), cooldown, hold)
+        assert total == brute_force(values, cooldown, hold)
+        assert total == sum(values[i] for i in uses)
+        assert all(b - a >= cooldown for a, b in zip(uses, uses[1:]))
+        # a hold as long as the fight is no hold
+        assert best_uses(np.array(values, dtype=float), cooldown, len(values)) == best_uses(np.array(values, dtype=float), cooldown)
+
+def test_windows_end_at_phase_starts():
+    profile = DamageProfile([0, 100, 250, 300, 900], [1, 2, 4, 8, 16], 0, 1000, 100, phase_starts=[300])
+    assert profile.damage.tolist() == [1, 2, 4, 8, 0, 0, 0, 0, 0, 16]
+    assert profile.windows(300).tolist() == [7, 6, 4, 8, 0, 0, 0, 16, 16, 16]
+    assert profile.between(100, 300) == 6
+
+def test_optimizer_on_report(fake_report):
+    buffs = {2: [Buff('Divination', duration=20000, cooldown=120000, bonus=0.06)],
+        1: [Buff('Chain', duration=2000, cooldown=10000, hold=0)]}
+    plans = BuffOptimizer(fake_report).optimize_all(buffs)
+    assert set(plans) == {1, 2}
+    for plan in plans[1]:
+        profile = BuffOptimizer(fake_report).profile(1)
+        window = plan.buff.duration
+        assert plan.damage == pytest.approx(plan.buff.bonus * sum(profile.between(t, t + window) for t in plan.times))
+    chain = plans[1][1]
+    assert chain.times[0] == 1000 and len(chain.times) == 6
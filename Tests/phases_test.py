@@ -0,0 +1,43 @@
+from report.report import Report
+from report.enums import Encounter
+from report.queries import Q_EVENTS
+from report.modules.phases import Q_TIMELINE
+from Tests.conftest import FIGHTS
+
+def add_phase_events(fake_client):
+    """Thordan (10) and Nidhogg (11) turn targetable and die in turn, through each fight"""
+    for fight in FIGHTS:
+        extra = list()
+        for n in range(14):
+            t = fight['startTime'] + 2000 + n * 3000
+            boss = 10 + n % 2
+            extra.append({'timestamp': t, 'type': 'targetabilityupdate', 'sourceID': boss, 'targetID': boss,
+                'fight': fight['id'], 'targetable': n % 3 != 2})
+            extra.append({'timestamp': t + 1000, 'type': 'death', 'sourceID': -1, 'targetID': boss,
+                'fight': fight['id']})
+        events = fake_client.events[fight['id']]
+        fake_client.events[fight['id']] = sorted(events + extra, key=lambda e: e['timestamp'])
+
+def timelines(report):
+    for fight in report._fights.values():
+        fight.last_phase = 5
+    report.pm._build_all()
+    return {i: [(e.time, e.type_) for e in timeline] for i, timeline in report.pm.timelines.items()}
+
+def test_dsu_timelines_from_batched_query(fake_client):
+    add_phase_events(fake_client)
+    fake_client.PAGE_SIZE = 4 # several pages per alias
+    report = Report('fake', fake_client, Encounter.DSU)
+    fake_client.calls.clear()
+    batched = timelines(report)
+
+    queries = [query for query, _ in fake_client.calls]
+    assert Q_EVENTS not in queries
+    assert Q_TIMELINE in queries
+    assert report._events == {}
+
+    # the same as from each fight's events
+    loaded = Report('fake', fake_client, Encounter.DSU)
+    loaded.events(None)
+    assert timelines(loaded) == batched
+    assert len(batched[1]) == 2 + 5
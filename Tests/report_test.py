@@ -0,0 +1,65 @@
+from report.report import Report
+from report.enums import Encounter
+from Tests.conftest import FIGHTS, make_events
+
+def test_lookup_tables(fake_report):
+    assert fake_report.get_actor(10).name == 'Thordan'
+    assert fake_report.get_actor_ids('Bob') == [2]
+    assert fake_report.get_actor_ids('Nobody') == []
+    assert fake_report.get_actor_ids_of_type('Player') == [1, 2]
+    assert fake_report.get_ability('Reprisal') == [7535]
+    assert fake_report.get_ability(7531) == 'Rampart'
+
+def test_batch_name_resolution(fake_report):
+    assert fake_report.actor_names([1, 10, -1]) == ['Alice', 'Thordan', None]
+    assert fake_report.ability_names([25865, 7535], default='?') == ['Ancient Quaga', 'Reprisal']
+    targets = fake_report.events(1).types('cast').to_targets()
+    assert set(fake_report.actor_names(targets)) == {'Alice', 'Bob'}
+
+def test_windowed_fetch(fake_client):
+    fake_client.CONCURRENT = True # requests of a round are sent together, as by AsyncFFClient
+    report = Report('fake', fake_client, Encounter.DSU, windowed=True)
+    report.WINDOW_EVENTS = 40 # the stand-in pages every 50 events
+    expected = {f['id']: [(e['timestamp'], e['type'], e['sourceID']) for e in make_events(f)] for f in FIGHTS}
+
+    first = report.events(1)
+    assert [(e.time, e.type_, e.source) for e in first] == expected[1]
+    fake_client.calls.clear()
+
+    # the density seen in fight 1 splits fight 2 into windows, all requested in the first round
+    second = report.events(2)
+    assert [(e.time, e.type_, e.source) for e in second] == expected[2]
+    starts = [params['startTime'] for _, params in fake_client.calls]
+    assert len(starts) == len(set(starts)) >= 4
+    assert fake_client.calls[1][1]['endTime'] < FIGHTS[1]['endTime']
+
+def test_no_windows_for_serial_clients(fake_client):
+    report = Report('fake', fake_client, Encounter.DSU, windowed=True)
+    assert not report.windowed
+    report.events(1)
+    fake_client.calls.clear()
+    report.events(2)
+    assert {params['endTime'] for _, params in fake_client.calls} == {FIGHTS[1]['endTime']}
+
+def test_fetch_events_plans_per_fight(fake_report, fake_client):
+    fake_report.events(1)
+    fake_client.calls.clear()
+
+    # fight 1 is answered locally; only fight 2's time range goes to the server
+    events = fake_report.types('damage', [1, 2])
+    assert {params['fightIDs'][0] for _, params in fake_client.calls} == {2}
+    assert min(params['startTime'] for _, params in fake_client.calls) == FIGHTS[1]['startTime']
+    assert [e.time for e in events][:3] == [e['timestamp'] for e in make_events(FIGHTS[0]) if e['type'] == 'damage'][:3]
+    assert len(events) == 60 + 60
+
+def test_unfiltered_local_events_are_a_view(fake_report):
+    stored = fake_report.events(1)
+    stored.build_index()
+    times = [e.time for e in stored]
+
+    events = fake_report.filter('', 1)
+    assert events is not stored
+    reversed(events)
+    events.sort_phase()
+    assert [e.time for e in stored] == times
+    assert stored._index is not None
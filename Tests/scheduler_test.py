@@ -0,0 +1,89 @@
+from client.scheduler import RateLimitScheduler, Priority
+from report.queries import Q_EVENTS, Q_FIGHTS
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+def scheduler() -> tuple[RateLimitScheduler, Clock]:
+    clock = Clock()
+    return RateLimitScheduler(clock=clock, sleep=clock.sleep), clock
+
+def respond(s: RateLimitScheduler, ticket, spent: int, limit: int=3600, reset_in: int=None) -> None:
+    s.complete(ticket, {'limitPerHour': limit, 'pointsSpentThisHour': spent, 'pointsResetIn': reset_in})
+
+def test_learns_query_costs():
+    s, clock = scheduler()
+    respond(s, s.acquire(Q_FIGHTS), 100)
+    for spent in (105, 110, 115):
+        respond(s, s.acquire(Q_EVENTS), spent)
+    assert s.estimate(Q_EVENTS) == 5
+    assert s.estimate(Q_FIGHTS) == s.DEFAULT_COST
+    assert s.metrics()['points_remaining'] == 3600 - 115
+
+def test_bulk_slows_down_and_leaves_reserve():
+    s, clock = scheduler()
+    respond(s, s.acquire(Q_FIGHTS), 0)
+
+    # the bucket allows a burst, then paces bulk queries at the sustainable rate
+    burst = int(s.BULK_BURST * s.limit / s.DEFAULT_COST)
+    for _ in range(burst):
+        s.complete(s.acquire(Q_FIGHTS, Priority.BULK), None)
+    assert clock.now == 0
+    s.complete(s.acquire(Q_FIGHTS, Priority.BULK), None)
+    assert 0 < clock.now <= s.DEFAULT_COST / (s.limit / 3600) + s.POLL
+
+    # close to the cap bulk waits for the reset, interactive still runs
+    start = clock.now
+    respond(s, s.acquire(Q_FIGHTS), 3500, reset_in=600)
+    s.acquire(Q_FIGHTS, Priority.INTERACTIVE)
+    assert clock.now == start
+    s.acquire(Q_FIGHTS, Priority.BULK)
+    assert clock.now >= start + 600
+
+def test_interactive_goes_first():
+    s, clock = scheduler()
+    respond(s, s.acquire(Q_FIGHTS), 3400, reset_in=10)
+    bulk = s._enqueue(Q_FIGHTS, Priority.BULK)
+    interactive = s._enqueue(Q_FIGHTS, Priority.INTERACTIVE)
+    assert s.metrics()['queue_depth'] == 2
+    assert s.metrics()['queue_depth_bulk'] == 1
+
+    assert s._try_start(bulk) > 0
+    assert s._try_start(interactive) == 0
+    assert s.metrics()['queue_depth'] == 1
+
+def test_interrupted_acquire_releases_ticket():
+    import asyncio
+    import pytest
+
+    s, clock = scheduler()
+    respond(s, s.acquire(Q_FIGHTS), 3600, reset_in=600)
+
+    def interrupt(seconds):
+        raise KeyboardInterrupt
+    s._sleep = interrupt
+    with pytest.raises(KeyboardInterrupt):
+        s.acquire(Q_EVENTS)
+    assert s.metrics()['queue_depth'] == 0
+    s._sleep = clock.sleep
+
+    async def cancel_waiting():
+        task = asyncio.ensure_future(s.aacquire(Q_EVENTS))
+        await asyncio.sleep(0)
+        assert s.metrics()['queue_depth'] == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    asyncio.run(cancel_waiting())
+    assert s.metrics()['queue_depth'] == 0
+
+    # nothing abandoned is counted ahead of a later query
+    s.spent, s.remaining = 0, s.limit
+    assert s._try_start(s._enqueue(Q_EVENTS, Priority.INTERACTIVE)) == 0
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import asyncio
+
+import aiohttp
+from gql import gql
+from gql import Client as GQLClient
+from gql.transport.aiohttp import AIOHTTPTransport
+
+from client.client import FFClient
+from client.scheduler import Priority
+
+
+class AsyncFFClient(FFClient):
+    """
+    FFClient that sends queries with asyncio over one pooled, keep-alive HTTP session,
+    at most max_concurrency at a time. Caching works the same as FFClient.q.
+
+    q() and q_many() can be called from normal code; they run on the client's own event loop.
+    From coroutines running on that loop (see run()), use aq() and aq_many().
+    """
+    EXECUTE_TIMEOUT = 60 # seconds
+    CONCURRENT = True
+
+    def __init__(self, *, max_concurrency: int=8, **kwargs) -> None:
+        # set before FFClient.__init__, which calls refresh_token() when no token is given
+        self._async_transport = None
+        self._async_client = None
+        self._async_session = None # connected on first query
+        super().__init__(**kwargs)
+        self.max_concurrency = max_concurrency
+        self._loop = asyncio.new_event_loop()
+        self._semaphore = None
+        self._inflight = dict() # cache key: task, so equal concurrent queries are sent once
+
+    def refresh_token(self) -> AsyncFFClient:
+        super().refresh_token()
+        if self._async_transport is not None:
+            self._async_transport.headers = self._transport.headers
+        return self
+
+    async def _connect(self) -> 'AsyncClientSession':
+        if self._async_session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60)
+            self._async_transport = AIOHTTPTransport(url=self.url,
+                headers=self._transport.headers,
+                client_session_args={'connector': connector})
+            self._async_client = GQLClient(transport=self._async_transport,
+                fetch_schema_from_transport=False,
+                execute_timeout=self.EXECUTE_TIMEOUT)
+            self._async_session = await self._async_client.connect_async()
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._async_session
+
+    async def _aq(self, query: str, params: dict, priority: Priority=Priority.INTERACTIVE) -> dict:
+        session = await self._connect()
+        ticket = None
+        try:
+            ticket = await self.scheduler.aacquire(query, priority)
+            async with self._semaphore:
+                res = await session.execute(gql(query), variable_values=params)
+        except BaseException:
+            if ticket is not None: # aacquire cancels its own ticket if interrupted
+                self.scheduler.cancel(ticket)
+            raise
+        self.scheduler.complete(ticket, res.get('rateLimitData'))
+        return res
+
+    async def _fetch_and_store(self, query: str, params: dict, priority: Priority,
+        report_code: str, key: str) -> dict:
+        return self._store(report_code, key, await self._aq(query, params, priority))
+
+    async def aq(self, query: str, params: dict, *, cache: bool=True,
+        priority: Priority=Priority.INTERACTIVE) -> dict:
+        report_code = params.get('reportCode', None)
+        if report_code is None or cache is False:
+            return self._observe(query, params, await self._aq(query, params, priority))
+
+        key = self._cache_key(query, params)
+        if (res:=self._cached(report_code, key)) is None and (res:=self._subsumed(query, params, key)) is None:
+            if (task:=self._inflight.get(key)) is None:
+                task = asyncio.ensure_future(self._fetch_and_store(query, params, priority, report_code, key))
+                self._inflight[key] = task
+                try:
+                    res = await task
+                finally:
+                    del self._inflight[key]
+            else:
+                res = await task
+
+        return self._observe(query, params, res)
+
+    async def aq_many(self, requests: list[tuple[str, dict]], *, cache: bool=True,
+        priority: Priority=Priority.INTERACTIVE) -> list[dict]:
+        return await asyncio.gather(*(self.aq(query, params, cache=cache, priority=priority)
+            for query, params in requests))
+
+    def q(self, query: str, params: dict, *, cache: bool=True, priority: Priority=Priority.INTERACTIVE) -> dict:
+        return self.run(self.aq(query, params, cache=cache, priority=priority))
+
+    def q_many(self, requests: list[tuple[str, dict]], *, cache: bool=True,
+        priority: Priority=Priority.INTERACTIVE) -> list[dict]:
+        """Runs the requests concurrently, returning results in the same order"""
+        return self.run(self.aq_many(requests, cache=cache, priority=priority))
+
+    def run(self, coroutine):
+        """Runs a coroutine on the client's event loop"""
+        return self._loop.run_until_complete(coroutine)
+
+    def close(self) -> None:
+        if self._async_session is not None:
+            self.run(self._async_client.close_async())
+            self._async_session = None
+        self._loop.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import os
+import json
+import sqlite3
+import threading
+from typing import Any, Callable
+from collections import OrderedDict
+
+class FrozenDict(dict):
+    """
+    Read-only dict for cached query results, which are shared by every caller instead of copied.
+    Still a dict, so isinstance checks and json.dumps work as before.
+    """
+    def _readonly(self, *args, **kwargs):
+        raise TypeError('cached query results are read-only; copy them to change them')
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        # copies (including deepcopy) are ordinary, writable dicts
+        return (dict, (dict(self),))
+
+def freeze(data: Any) -> Any:
+    """Read-only version of a query result: dicts become FrozenDicts and lists become tuples"""
+    if isinstance(data, dict):
+        return data if isinstance(data, FrozenDict) else FrozenDict((k, freeze(v)) for k, v in data.items())
+    if isinstance(data, list):
+        return tuple(freeze(v) for v in data)
+    return data
+
+class MemoryCache:
+    """
+    In-process layer over the on-disk cache, holding the most recently used results up to a
+    budget of entries and/or bytes (the size of an entry is the length of its JSON).
+    Least recently used entries are dropped first. Results are written to disk when fetched,
+    so an evicted entry is still on disk and is read back on its next use.
+    """
+    def __init__(self, max_entries: int=None, max_bytes: int=None) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict() # (report code, key): (value, size), least recent first
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, report_code: str, key: str) -> Any:
+        with self._lock:
+            if (entry:=self._entries.get((report_code, key))) is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((report_code, key))
+            self.hits += 1
+            return entry[0]
+
+    def put(self, report_code: str, key: str, value: Any, size: int=None) -> None:
+        if size is None:
+            size = len(json.dumps(value))
+        with self._lock:
+            if (old:=self._entries.pop((report_code, key), None)) is not None:
+                self.resident_bytes -= old[1]
+            self._entries[(report_code, key)] = (value, size)
+            self.resident_bytes += size
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._entries and (
+            (self.max_entries is not None and len(self._entries) > self.max_entries) or
+            (self.max_bytes is not None and self.resident_bytes > self.max_bytes)):
+            _, (_, size) = self._entries.popitem(last=False)
+            self.resident_bytes -= size
+            self.evictions += 1
+
+    def delete(self, report_code: str=None) -> None:
+        """Drops a report's entries, or every entry"""
+        with self._lock:
+            for k in [k for k in self._entries if report_code is None or k[0] == report_code]:
+                self.resident_bytes -= self._entries.pop(k)[1]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'resident_bytes': self.resident_bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+            }
+
+class SqliteCache:
+    """
+    On-disk query cache in SQLite (WAL mode), one row per (report code, query key).
+    Entries are written once when fetched and read one at a time, so a lookup is a
+    single indexed read however many reports are cached.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS entries (
+                report TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (report, key)
+            ) WITHOUT ROWID''')
+
+    def get(self, report_code: str, key: str) -> dict | None:
+        return entry[0] if (entry:=self.get_sized(report_code, key)) else None
+
+    def get_sized(self, report_code: str, key: str) -> tuple[dict, int] | None:
+        """An entry and the length of its JSON, or None"""
+        with self._lock:
+            row = self._db.execute('SELECT value FROM entries WHERE report=? AND key=?',
+                (report_code, key)).fetchone()
+        return (json.loads(row[0]), len(row[0])) if row else None
+
+    def put(self, report_code: str, key: str, value: dict) -> int:
+        """Stores an entry, returning the length of its JSON"""
+        data = json.dumps(value)
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO entries (report, key, value) VALUES (?, ?, ?)',
+                (report_code, key, data))
+        return len(data)
+
+    def put_many(self, report_code: str, entries: dict[str, dict]) -> None:
+        rows = [(report_code, k, json.dumps(v)) for k, v in entries.items()]
+        with self._lock:
+            with self._db:
+                self._db.execute('BEGIN')
+                self._db.executemany('INSERT OR REPLACE INTO entries (report, key, value) VALUES (?, ?, ?)', rows)
+
+    def has(self, report_code: str, key: str) -> bool:
+        with self._lock:
+            return self._db.execute('SELECT 1 FROM entries WHERE report=? AND key=?',
+                (report_code, key)).fetchone() is not None
+
+    def keys(self, report_code: str) -> list[str]:
+        with self._lock:
+            return [k for k, in self._db.execute('SELECT key FROM entries WHERE report=?', (report_code,))]
+
+    def delete(self, report_code: str=None) -> None:
+        """Deletes a report's entries, or every entry"""
+        with self._lock:
+            if report_code is None:
+                self._db.execute('DELETE FROM entries')
+            else:
+                self._db.execute('DELETE FROM entries WHERE report=?', (report_code,))
+
+    def import_json(self, report_code: str, path: str, rekey: Callable[[str], str]=None) -> bool:
+        """
+        Imports a per-report JSON cache file ({key: result}) as written by older versions,
+        converting keys with rekey if given
+        """
+        try:
+            with open(path, 'r') as f:
+                entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return False
+        if rekey is not None:
+            entries = {rekey(k): v for k, v in entries.items()}
+        self.put_many(report_code, entries)
+        return True
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -9,27 +9,49 @@ from gql import Client as GQLClient
 from gql.transport.requests import RequestsHTTPTransport
 
 import os
-import json
-from copy import deepcopy
 
 from config import CLIENT_ID, CLIENT_SECRET
+from client.scheduler import RateLimitScheduler, Priority
+from client.cache import MemoryCache, SqliteCache, freeze
+from client.subsume import canonical_key, legacy_to_canonical, split_key, query_name, compile_filter, covering_pages
 
 
 class FFClient:
     CLIENT_API_URL = 'https://www.fflogs.com/api/v2/client'
     OAUTH_TOKEN_URL = 'https://www.fflogs.com/oauth/token'
     CACHE_DIR = './querycache'
+    CACHE_DB = 'cache.sqlite3'
+    CACHE_MAX_BYTES = 256 * 2**20 # in-memory cache budget, as JSON length
+    CONCURRENT = False # whether q_many sends its requests concurrently
 
-    def __init__(self) -> None:
+    def __init__(self, *, url: str=None, token: str=None,
+        cache_max_bytes: int=CACHE_MAX_BYTES, cache_max_entries: int=None) -> None:
+        """
+        url and token default to the FFLogs client API and a token from OAuth.
+        Query results are cached on disk; the most recently used are also kept in memory,
+        up to cache_max_bytes and cache_max_entries (None for no limit).
+        """
+        self.url = url or self.CLIENT_API_URL
         self._auth = HTTPBasicAuth(CLIENT_ID, CLIENT_SECRET)
         client = oauth2.BackendApplicationClient(CLIENT_ID)
         self._session = OAuth2Session(client=client)
-        self._transport = RequestsHTTPTransport(url=self.CLIENT_API_URL)
+        self._transport = RequestsHTTPTransport(url=self.url)
         self._client = GQLClient(transport=self._transport, fetch_schema_from_transport=True)
 
-        # cache is {reportcode: {params+query: res}}
-        self._cache = {}
-        self.refresh_token()
+        # caches are {(reportcode, params+query): res}
+        self._memory = MemoryCache(cache_max_entries, cache_max_bytes)
+        self._disk_cache = None # SqliteCache, opened on first use
+        self._disk_hits = 0
+        self.subsumed = 0 # queries answered from other cached results
+        self._checked_reports = set() # report codes checked for old JSON cache files
+        self._fight_spans = dict() # (reportcode, fight id): (start time, end time), from Fights results
+        self._pages = dict() # reportcode: {encounter id: {fight id: {startTime: (key, endTime)}}}, see _cached_pages
+        self._master_keys = dict() # reportcode: key of its cached MasterData
+        self.scheduler = RateLimitScheduler()
+        if token is None:
+            self.refresh_token()
+        else:
+            self._transport.headers = {'Authorization': f'Bearer {token}'}
 
     def refresh_token(self) -> FFClient:
         token = self._session.fetch_token(
@@ -40,49 +62,171 @@ class FFClient:
         self._transport.headers = {'Authorization': f'Bearer {access_token}'}
         return self
 
-    def _q(self, query: str, params: dict) -> dict:
-        res = self._client.execute(gql(query), variable_values=params)
-        print(res.get('rateLimitData', 'no rateLimitData'))
+    def _q(self, query: str, params: dict, priority: Priority=Priority.INTERACTIVE) -> dict:
+        ticket = self.scheduler.acquire(query, priority)
+        try:
+            res = self._client.execute(gql(query), variable_values=params)
+        except BaseException:
+            self.scheduler.cancel(ticket)
+            raise
+        self.scheduler.complete(ticket, res.get('rateLimitData'))
         return res
 
-    def q(self, query: str, params: dict, *, cache: bool=True) -> dict:
+    def q(self, query: str, params: dict, *, cache: bool=True, priority: Priority=Priority.INTERACTIVE) -> dict:
+        """Cached results are shared and read-only (see client.cache.freeze); copy them to change them"""
         report_code = params.get('reportCode', None)
         if report_code is None or cache is False:
-            return self._q(query, params)
+            return self._observe(query, params, self._q(query, params, priority))
+
+        key = self._cache_key(query, params)
+        if (res:=self._cached(report_code, key)) is None and (res:=self._subsumed(query, params, key)) is None:
+            res = self._store(report_code, key, self._q(query, params, priority))
+
+        return self._observe(query, params, res)
+
+    def q_many(self, requests: list[tuple[str, dict]], *, cache: bool=True,
+        priority: Priority=Priority.INTERACTIVE) -> list[dict]:
+        """Runs several (query, params) requests one after another, returning results in the same order"""
+        return [self.q(query, params, cache=cache, priority=priority) for query, params in requests]
+
+    def metrics(self) -> dict:
+        """Rate limit budget and queue of the scheduler"""
+        return self.scheduler.metrics()
+
+    @staticmethod
+    def _cache_key(query: str, params: dict) -> str:
+        return canonical_key(query, params)
+
+    def _observe(self, query: str, params: dict, res: dict) -> dict:
+        """Notes the fight times in Fights results, which tell what cached events cover"""
+        if query_name(query) == 'Fights' and (report_code:=params.get('reportCode')) is not None:
+            for f in res['reportData']['report']['fights']:
+                self._fight_spans[(report_code, f['id'])] = (f['startTime'], f['endTime'])
+        return res
+
+    def _subsumed(self, query: str, params: dict, key: str) -> dict | None:
+        """
+        Answers a filtered Events query locally, if every fight it asks for has cached unfiltered
+        pages covering its time range and the filter is simple enough (see compile_filter).
+        Returns None otherwise.
+        """
+        if query_name(query) != 'Events' or not params.get('filter') or not params.get('fightIDs'):
+            return None
+
+        report_code = params['reportCode']
+        pages, master_key = self._cached_pages(report_code, params.get('encounterID'))
+        abilities = None
+        def ability_ids(name: str) -> set[int] | None:
+            nonlocal abilities
+            if abilities is None:
+                if master_key is None or (master:=self._cached(report_code, master_key)) is None:
+                    return None
+                abilities = dict()
+                for a in master['reportData']['report']['masterData']['abilities']:
+                    abilities.setdefault(a['name'], set()).add(a['gameID'])
+            return abilities.get(name, set())
+        if (predicate:=compile_filter(params['filter'], ability_ids)) is None:
+            return None
+
+        data = list()
+        for fight_id in params['fightIDs']:
+            if (span:=self._fight_spans.get((report_code, fight_id))) is None:
+                return None
+            start = max(params.get('startTime', span[0]), span[0])
+            end = min(params.get('endTime', span[1]), span[1])
+            if start > end:
+                continue
+            load = lambda k: self._cached(report_code, k)
+            if (chain:=covering_pages(pages.get(fight_id, {}), load, start, end)) is None:
+                return None
+            data += [e for events, low, high in chain for e in events
+                if low <= e['timestamp'] <= high and predicate(e)]
+        data.sort(key=lambda e: e['timestamp'])
+
+        res = freeze({'reportData': {'report': {'events': {'data': data, 'nextPageTimestamp': None}}}})
+        self._memory.put(report_code, key, res)
+        self.subsumed += 1
+        return res
+
+    def _cached_pages(self, report_code: str, encounter_id: int | None) -> tuple[dict, str | None]:
+        """
+        Cached unfiltered single-fight Events pages of a report, {fight id: {startTime: (key, endTime)}},
+        and the key of its cached MasterData, if any.
+        The disk cache's keys are read once per report; _store adds new ones.
+        """
+        if report_code not in self._pages:
+            self._pages[report_code] = dict()
+            for key in self._disk().keys(report_code):
+                self._index_page(report_code, key)
+        return self._pages[report_code].get(encounter_id, {}), self._master_keys.get(report_code)
 
-        if report_code not in self._cache:
+    def _index_page(self, report_code: str, key: str) -> None:
+        """Adds a cached result to the report's index, if it is MasterData or an unfiltered page"""
+        params, name = split_key(key)
+        if name == 'MasterData':
+            self._master_keys[report_code] = key
+        elif (name == 'Events' and 'filter' not in params and len(params.get('fightIDs', ())) == 1
+            and 'startTime' in params and 'endTime' in params):
+            encounter_pages = self._pages[report_code].setdefault(params.get('encounterID'), {})
+            fight_pages = encounter_pages.setdefault(params['fightIDs'][0], {})
+            start, end = params['startTime'], params['endTime']
+            if start not in fight_pages or fight_pages[start][1] < end:
+                fight_pages[start] = (key, end)
+
+    def _cached(self, report_code: str, key: str) -> dict | None:
+        """Cached result from memory, then disk, or None"""
+        if report_code not in self._checked_reports:
+            self._checked_reports.add(report_code)
             self.load_cache(report_code)
+        if (res:=self._memory.get(report_code, key)) is None and (entry:=self._disk().get_sized(report_code, key)):
+            self._disk_hits += 1
+            res = freeze(entry[0])
+            self._memory.put(report_code, key, res, entry[1])
+        return res
 
-        key = json.dumps(params) + query
-        if key not in self._cache.setdefault(report_code, {}):
-            self._cache[report_code][key] = self._q(query, params)
+    def _store(self, report_code: str, key: str, res: dict) -> dict:
+        """Caches a result, returning its read-only version"""
+        size = self._disk().put(report_code, key, res)
+        if report_code in self._pages:
+            self._index_page(report_code, key)
+        res = freeze(res)
+        self._memory.put(report_code, key, res, size)
+        return res
 
-        return deepcopy(self._cache[report_code][key])
+    def cache_stats(self) -> dict:
+        """Hits, misses, evictions and resident bytes of the in-memory cache, and hits on disk"""
+        return self._memory.stats() | {'disk_hits': self._disk_hits, 'subsumed': self.subsumed}
 
-    def save_cache(self) -> None:
-        if not os.path.exists(self.CACHE_DIR):
-            os.makedirs(self.CACHE_DIR)
+    def _disk(self) -> SqliteCache:
+        """The on-disk cache, opened on first use"""
+        if self._disk_cache is None:
+            os.makedirs(self.CACHE_DIR, exist_ok=True)
+            self._disk_cache = SqliteCache(os.path.join(self.CACHE_DIR, self.CACHE_DB))
+        return self._disk_cache
 
-        for report_code in self._cache:
-            cache_path = os.path.join(self.CACHE_DIR, f'{report_code}.json')
-            with open(cache_path, 'w') as f:
-                json.dump(self._cache[report_code], f)
+    def save_cache(self) -> None:
+        """Entries are written to disk when fetched; kept for older callers"""
+        pass
 
     def load_cache(self, report_code: str) -> bool:
-        if not os.path.exists(self.CACHE_DIR):
-            return False
+        """Imports a report's JSON cache file from older versions into the database, if there is one"""
         cache_path = os.path.join(self.CACHE_DIR, f'{report_code}.json')
-
-        try:
-            with open(cache_path, 'r') as f:
-                self._cache[report_code] = json.load(f)
-                return True
-        except FileNotFoundError:
-            # print(f"No cache for {report_code=}")
-            # self._cache[report_code] = {}
+        if not os.path.exists(cache_path):
             return False
 
+        imported = self._disk().import_json(report_code, cache_path, rekey=legacy_to_canonical)
+        if imported:
+            os.replace(cache_path, cache_path + '.imported')
+        return imported
+
     def clear_cache(self) -> None:
+        self._memory.delete()
+        self._pages.clear()
+        self._master_keys.clear()
+        if not os.path.exists(self.CACHE_DIR):
+            return
+        self._disk().delete()
+
         cache_files = list(filter(
             lambda f: f.endswith('.json'),
             os.listdir(self.CACHE_DIR)
@@ -90,7 +234,7 @@ class FFClient:
 
         for file in cache_files:
             try:
-                os.remove(file)
+                os.remove(os.path.join(self.CACHE_DIR, file))
             except OSError:
                 pass
 
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import re
+import time
+import asyncio
+import threading
+from enum import IntEnum
+from itertools import count
+
+class Priority(IntEnum):
+    """Lower runs first"""
+    INTERACTIVE = 0 # e.g. one fight someone is looking at
+    BULK = 1 # e.g. backfilling every fight of a week of reports
+
+class Ticket:
+    """A query waiting for, or holding, points from the scheduler"""
+    def __init__(self, seq: int, name: str, priority: Priority, cost: float) -> None:
+        self.seq = seq
+        self.name = name
+        self.priority = priority
+        self.cost = cost
+
+    def key(self) -> tuple[int, int]:
+        return (self.priority, self.seq)
+
+class RateLimitScheduler:
+    """
+    Schedules queries against the FFLogs hourly points budget, kept in sync with the
+    rateLimitData of each response.
+
+    Each query is charged its estimated cost (a running average of what queries with the
+    same name have cost) when it starts, and queries start in priority order.
+    Interactive queries may spend the whole budget. Bulk queries leave a reserve of it for
+    interactive ones, and also draw from a token bucket that refills at limitPerHour/3600
+    points per second, so after an initial burst a backfill runs at a pace the budget can
+    sustain. When the budget is used up, queries wait for the hourly reset instead of
+    failing at the cap.
+    """
+    DEFAULT_LIMIT = 3600 # points per hour, until a response says otherwise
+    DEFAULT_COST = 2.0 # points, for queries not seen before
+    BULK_RESERVE = 0.1 # fraction of the hourly limit bulk queries leave alone
+    BULK_BURST = 0.25 # bucket size, as a fraction of the hourly limit
+    COST_SMOOTHING = 0.3 # weight of the newest observation in the cost averages
+    POLL = 0.05 # seconds between checks while waiting behind other queries
+    RECHECK = 60 # seconds to wait for a reset of unknown time
+
+    def __init__(self, *, clock=time.monotonic, sleep=time.sleep) -> None:
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._seq = count()
+
+        self.limit = self.DEFAULT_LIMIT
+        self.spent = 0 # as last reported
+        self.remaining = float(self.DEFAULT_LIMIT) # budget left this hour, less running queries
+        self._reset_at = None # clock time of the next hourly reset, if known
+        self._synced = False # whether a response has been seen
+
+        self.tokens = self.BULK_BURST * self.DEFAULT_LIMIT # bulk token bucket
+        self._refilled_at = clock()
+
+        self._costs = dict() # query name: average points
+        self._waiting = dict() # seq: Ticket
+        self._running = dict() # seq: Ticket
+        self.waited = 0.0 # total seconds spent waiting
+
+    @staticmethod
+    def query_name(query: str) -> str:
+        match = re.search(r'query\s+(\w+)', query)
+        return match.group(1) if match else 'anonymous'
+
+    def estimate(self, query: str) -> float:
+        """Estimated points cost of a query"""
+        return self._costs.get(self.query_name(query), self.DEFAULT_COST)
+
+    def _rate(self) -> float:
+        return self.limit / 3600
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.tokens = min(self.BULK_BURST * self.limit, self.tokens + (now - self._refilled_at) * self._rate())
+        self._refilled_at = now
+        if self._reset_at is not None and now >= self._reset_at:
+            self.spent = 0
+            self.remaining = self.limit - sum(t.cost for t in self._running.values())
+            self._reset_at = None
+
+    def _enqueue(self, query: str, priority: Priority) -> Ticket:
+        with self._lock:
+            ticket = Ticket(next(self._seq), self.query_name(query), priority, self.estimate(query))
+            self._waiting[ticket.seq] = ticket
+            return ticket
+
+    def _try_start(self, ticket: Ticket) -> float:
+        """Starts the ticket and returns 0, or returns how long to wait before trying again"""
+        with self._lock:
+            self._refill()
+            # queries ahead in the queue keep their points, so this one can't overtake them
+            ahead = [t for t in self._waiting.values() if t.key() < ticket.key()]
+            need = ticket.cost + sum(t.cost for t in ahead)
+            bulk = ticket.priority is Priority.BULK
+
+            reserve = self.BULK_RESERVE * self.limit if bulk else 0
+            if need + reserve > self.remaining:
+                if ahead:
+                    return self.POLL
+                if self._reset_at is None:
+                    return self.RECHECK
+                return max(self._reset_at - self._clock(), self.POLL)
+
+            if bulk:
+                need_tokens = ticket.cost + sum(t.cost for t in ahead if t.priority is Priority.BULK)
+                if need_tokens > self.tokens:
+                    return max((need_tokens - self.tokens) / self._rate(), self.POLL)
+                self.tokens -= ticket.cost
+
+            self.remaining -= ticket.cost
+            del self._waiting[ticket.seq]
+            self._running[ticket.seq] = ticket
+            return 0
+
+    def acquire(self, query: str, priority: Priority=Priority.INTERACTIVE) -> Ticket:
+        """Blocks until the query may be sent"""
+        ticket = self._enqueue(query, priority)
+        try:
+            while (delay:=self._try_start(ticket)) > 0:
+                self.waited += delay
+                self._sleep(delay)
+        except BaseException: # interrupted; its points must not hold up the queries behind it
+            self.cancel(ticket)
+            raise
+        return ticket
+
+    async def aacquire(self, query: str, priority: Priority=Priority.INTERACTIVE) -> Ticket:
+        """Waits until the query may be sent, without blocking the event loop"""
+        ticket = self._enqueue(query, priority)
+        try:
+            while (delay:=self._try_start(ticket)) > 0:
+                self.waited += delay
+                await asyncio.sleep(delay)
+        except BaseException: # cancelled; its points must not hold up the queries behind it
+            self.cancel(ticket)
+            raise
+        return ticket
+
+    def complete(self, ticket: Ticket, rate_limit_data: dict | None) -> None:
+        """Records a finished query and the rateLimitData of its response"""
+        with self._lock:
+            alone = len(self._running) == 1
+            self._running.pop(ticket.seq, None)
+            if not rate_limit_data:
+                return
+
+            spent = rate_limit_data['pointsSpentThisHour']
+            observed = spent - self.spent
+            # with no other query finished meanwhile the change is this query's cost,
+            # unless it's too big to be one query (points spent by another program)
+            if self._synced and alone and 0 <= observed <= self.BULK_RESERVE * self.limit:
+                old = self._costs.get(ticket.name, observed)
+                self._costs[ticket.name] = (1 - self.COST_SMOOTHING) * old + self.COST_SMOOTHING * observed
+
+            now = self._clock()
+            self.limit = rate_limit_data['limitPerHour']
+            self.spent = spent
+            self._synced = True
+            if (reset_in:=rate_limit_data.get('pointsResetIn')) is not None:
+                self._reset_at = now + reset_in
+            # the server is the truth; still count points of queries it hasn't answered yet
+            pending = sum(t.cost for t in self._running.values())
+            self.remaining = self.limit - self.spent - pending
+
+    def cancel(self, ticket: Ticket) -> None:
+        """Forgets a query that failed or was abandoned, returning its points"""
+        with self._lock:
+            if self._waiting.pop(ticket.seq, None) is None and self._running.pop(ticket.seq, None):
+                self.remaining += ticket.cost
+                if ticket.priority is Priority.BULK:
+                    self.tokens += ticket.cost
+
+    def metrics(self) -> dict:
+        with self._lock:
+            self._refill()
+            waiting = list(self._waiting.values())
+            return {
+                'queue_depth': len(waiting),
+                'queue_depth_interactive': sum(t.priority is Priority.INTERACTIVE for t in waiting),
+                'queue_depth_bulk': sum(t.priority is Priority.BULK for t in waiting),
+                'running': len(self._running),
+                'limit_per_hour': self.limit,
+                'points_spent_this_hour': self.spent,
+                'points_remaining': self.remaining,
+                'bulk_tokens': self.tokens,
+                'estimated_costs': dict(self._costs),
+                'seconds_waited': self.waited,
+            }
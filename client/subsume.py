@@ -0,0 +1,156 @@
+from __future__ import annotations
+from typing import Any, Callable
+
+import json
+
+from client.scheduler import RateLimitScheduler
+from report.data import Event
+from report.filters import parse, FilterError, CATEGORIES, And, Or, Not, Compare, Call
+
+query_name = RateLimitScheduler.query_name
+
+def normalize_params(params: dict) -> dict:
+    """
+    Params with the same meaning compare equal: unset values and an empty filter are dropped,
+    fight ids are sorted and whole-number times are ints
+    """
+    normal = dict()
+    for k, v in params.items():
+        if v is None or (k == 'filter' and v == ''):
+            continue
+        if k == 'fightIDs' and isinstance(v, (list, tuple)):
+            v = sorted(v)
+        elif isinstance(v, float) and v.is_integer():
+            v = int(v)
+        normal[k] = v
+    return normal
+
+def canonical_key(query: str, params: dict) -> str:
+    """Cache key that doesn't depend on param order or the query's whitespace"""
+    return json.dumps(normalize_params(params), sort_keys=True, separators=(',', ':')) + ' '.join(query.split())
+
+def legacy_to_canonical(key: str) -> str:
+    """Canonical key for a key of older versions, json.dumps(params) + query"""
+    params, end = json.JSONDecoder().raw_decode(key)
+    return canonical_key(key[end:], params)
+
+def split_key(key: str) -> tuple[dict, str]:
+    """(params, query name) of a canonical key"""
+    params, end = json.JSONDecoder().raw_decode(key)
+    return params, query_name(key[end:])
+
+
+# filter fields answered from cached events: key in the raw event data. Event.OPTIONAL names
+# (amount, hitType, ...) are keys already, as in report.filters; other fields go to the server
+_FIELDS = {
+    'type': 'type',
+    'timestamp': 'timestamp',
+    'fight': 'fight',
+    'source.id': 'sourceID',
+    'sourceID': 'sourceID',
+    'target.id': 'targetID',
+    'targetID': 'targetID',
+    'ability.id': 'abilityGameID',
+    'abilityGameID': 'abilityGameID',
+}
+
+def compile_filter(expression: str, ability_ids: Callable[[str], set[int] | None]) -> Callable[[dict], bool] | None:
+    """
+    Predicate over raw events for a filter expression, parsed with report.filters.parse.
+    Supports AND, OR, NOT and comparisons of event fields, ability.name and inCategory().
+    ability_ids resolves an ability name, or returns None if it can't. Returns None for
+    anything else, which then goes to the server.
+    """
+    try:
+        return _compile(parse(expression), ability_ids)
+    except (FilterError, _Unsupported):
+        return None
+
+class _Unsupported(Exception):
+    pass
+
+def _compile(node, ability_ids: Callable[[str], set[int] | None]) -> Callable[[dict], bool]:
+    if isinstance(node, And):
+        predicates = [_compile(i, ability_ids) for i in node.items]
+        return lambda e: all(p(e) for p in predicates)
+    if isinstance(node, Or):
+        predicates = [_compile(i, ability_ids) for i in node.items]
+        return lambda e: any(p(e) for p in predicates)
+    if isinstance(node, Not):
+        predicate = _compile(node.item, ability_ids)
+        return lambda e: not predicate(e)
+    return _compare(node, ability_ids)
+
+def _compare(node: Compare, ability_ids: Callable[[str], set[int] | None]) -> Callable[[dict], bool]:
+    """Missing keys are None, which is in no set and compares false, as in report.filters.Test"""
+    op, value = node.op, node.value
+    values = value if isinstance(value, tuple) else (value,)
+    if isinstance(node.field, Call):
+        call = node.field
+        if call.name.lower() != 'incategory' or len(call.args) != 1 or op not in ('=', '!=') \
+            or not isinstance(value, bool) or (types:=CATEGORIES.get(str(call.args[0]).lower())) is None:
+            raise _Unsupported(str(node))
+        key, allowed, included = 'type', types, (op == '=') == value
+    elif node.field == 'ability.name':
+        if op not in ('=', '!=', 'in', 'not in'):
+            raise _Unsupported(str(node))
+        allowed = set()
+        for name in values:
+            if (found:=ability_ids(str(name))) is None:
+                raise _Unsupported(str(node))
+            allowed |= found
+        key, included = 'abilityGameID', op in ('=', 'in')
+    elif node.field in _FIELDS or node.field in Event.OPTIONAL:
+        key = _FIELDS.get(node.field, node.field)
+        if op in ('<', '<=', '>', '>='):
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                raise _Unsupported(str(node))
+            compare = {'<': lambda v: v < value, '<=': lambda v: v <= value,
+                '>': lambda v: v > value, '>=': lambda v: v >= value}[op]
+            return lambda e: (v:=e.get(key)) is not None and compare(v)
+        allowed, included = set(values), op in ('=', 'in')
+    else:
+        raise _Unsupported(str(node))
+
+    if included:
+        return lambda e: e.get(key) in allowed
+    return lambda e: e.get(key) not in allowed
+
+def covering_pages(pages: dict[int, tuple[str, int]], load: Callable[[str], dict | None],
+    start: int, end: int) -> list[tuple[list[dict], int, int]] | None:
+    """
+    Cached unfiltered pages of one fight that together hold all its events from start to end.
+    pages is {startTime: (key, endTime)}; a page holds events from its startTime up to before
+    its nextPageTimestamp, or up to its endTime if it is the last page of its window.
+    Returns [(events, first time, last time)], the part of each page to use, or None.
+    Timestamps are whole milliseconds.
+    """
+    out = list()
+    time = start
+    while True:
+        # the page holding this time starts at or before it; pages chain on from the latest
+        starts = [s for s in pages if s <= time]
+        if not starts:
+            return None
+        key, end_time = pages[max(starts)]
+        if (res:=load(key)) is None:
+            return None
+        events = res['reportData']['report']['events']
+        next_page = events['nextPageTimestamp']
+        if next_page is None:
+            if end_time < time:
+                return None
+            if end_time < end:
+                # the last page of a window ending early; another window may carry on after it
+                out.append((events['data'], time, end_time))
+                time = end_time + 1
+                continue
+            out.append((events['data'], time, end))
+            return out
+        if next_page <= time:
+            return None
+        if end < next_page:
+            out.append((events['data'], time, end))
+            return out
+        out.append((events['data'], time, next_page - 1))
+        time = next_page
@@ -6,7 +6,8 @@ py -m pip install --upgrade pip
 py -m pip install oauthlib
 py -m pip install requests
 py -m pip install requests-oauthlib
-py -m pip install gql[requests]
+py -m pip install gql[requests,aiohttp]
+py -m pip install numpy
 
 py -m pip install beautifulsoup4
 py -m pip install selenium
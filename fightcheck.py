@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import Any
+from typing import Any, Callable
 
 from collections import Counter
 
@@ -7,7 +7,35 @@ from enums import Encounter, ReportCodes, Yoon
 from config import CLIENT_ID, CLIENT_SECRET
 from client import FFClient
 from report import Report
-from data import EventList
+from data import Event, EventList
+
+class DeferredFile:
+    """
+    Writes in order, where some parts are functions giving the text, called at flush().
+    Lets the checks of a fight be written in place after work shared by all of them is done
+    """
+    def __init__(self, f) -> None:
+        self._f = f
+        self._parts = list() # str or Callable[[], str]
+
+    def write(self, text: str) -> None:
+        self._parts.append(text)
+
+    def write_later(self, func: Callable[[], str]) -> None:
+        self._parts.append(func)
+
+    def flush(self) -> None:
+        for part in self._parts:
+            self._f.write(part if isinstance(part, str) else part())
+        self._parts = list()
+        self._f.flush()
+
+    def discard(self) -> None:
+        """Drops what hasn't been written yet"""
+        self._parts = list()
+
+    def close(self) -> None:
+        self._f.close()
 
 class FightCheck:
     class Mit:
@@ -72,11 +100,16 @@ class FightCheck:
                 f.write(f'No event\n')
                 return
 
+            # written once the auras at every check of the fight are known, see FightCheck.run
+            self.fc._check_later(self.event, self._missing)
+
+        def _missing(self) -> str:
+            """What the check found, as written after the header"""
             mit_list = set(self.mit_list + ['Well Fed'])
             debuffs = mit_list & self.DEBUFFS
             buffs = mit_list - self.DEBUFFS
 
-            active_auras = self._am.active_at(self.event, named=True) # active auras is by id
+            active_auras = self.fc.active_at(self.event) # active auras is by name
             
             missing = dict()
 
@@ -103,28 +136,64 @@ class FightCheck:
                 counter.update(v)
 
             if len(counter)==0:
-                f.write(' Good!\n')
-            else:
-                all_missing = set([k for k,v in counter.items() if v>=8])
-                if all_missing:
-                    f.write(f'\n!!! {all_missing=} !!!')
+                return ' Good!\n'
+
+            out = ''
+            all_missing = set([k for k,v in counter.items() if v>=8])
+            if all_missing:
+                out += f'\n!!! {all_missing=} !!!'
 
-                for k, v in missing.items():
-                    if individual_missing := v - all_missing:
-                        f.write(f'\n{individual_missing} missing from {k}')
-                f.write('\n')
+            for k, v in missing.items():
+                if individual_missing := v - all_missing:
+                    out += f'\n{individual_missing} missing from {k}'
+            return out + '\n'
 
     def __init__(self, report: Report, *, mit_only=False) -> None:
         self._r = report
         self._am = report.am
         self._pm = report.pm
         self.mit_only = mit_only # whether to include fight info
+        self._active = dict() # (fightID, time): named active auras, see prefetch()
+        self._checks = list() # events of the mit checks not yet written
+
+    def prefetch(self, events: EventList) -> None:
+        """Active auras at many events in one pass over the fight's auras, for active_at"""
+        events = list(events)
+        for e, active in zip(events, self._am.active_at_many(events, named=True)):
+            self._active[(e.fight, e.time)] = active
+
+    def active_at(self, event: Event) -> dict[str, list[str]]:
+        """Named active auras at an event, prefetched if possible"""
+        if (active:=self._active.get((event.fight, event.time))) is None:
+            active = self._am.active_at(event, named=True)
+        return active
+
+    def _check_later(self, event: Event, write: Callable[[], str]) -> None:
+        self._checks.append(event)
+        self._file.write_later(write)
+
+    def _flush(self) -> None:
+        """Finds the auras at every pending check in one pass per fight, then writes out"""
+        self.prefetch(self._checks)
+        self._checks = list()
+        self._file.flush()
+        self._active = dict()
+
+    def _discard(self) -> None:
+        """Drops the pending checks and output of a fight that failed"""
+        self._checks = list()
+        self._file.discard()
+        self._active = dict()
 
     def __enter__(self):
-        self._file = open('checker.txt', 'w')
+        self._file = DeferredFile(open('checker.txt', 'w'))
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self._flush()
+        else:
+            self._discard()
         self._file.close()
 
     def mit(self):
@@ -133,7 +202,17 @@ class FightCheck:
     def passed(self, boss_cast: str) -> bool:
         return len(self.events.casts(boss_cast)) > 0
 
-    def run(self, fight_id: int):
+    def run(self, fight_id: int) -> None:
+        """Checks a fight. Mit checks are written at the end, so their auras are found together"""
+        try:
+            self._run(fight_id)
+        except BaseException:
+            # no aura lookups or writes for a failed fight, which could hide its error
+            self._discard()
+            raise
+        self._flush()
+
+    def _run(self, fight_id: int):
         raise NotImplementedError('Run subclass of FightCheck')
 
 class FightCheckDsu(FightCheck):
@@ -142,7 +221,7 @@ class FightCheckDsu(FightCheck):
             raise TypeError(f'Using DSU checker for {encounter=}')
         super().__init__(report, **kwargs)
 
-    def run(self, fight_id: int) -> None:
+    def _run(self, fight_id: int) -> None:
         self.fight = self._r.fight(fight_id)
         self.events = self._r.events(fight_id)
 
@@ -0,0 +1,247 @@
+from __future__ import annotations
+from typing import Any, Callable, Iterable
+
+import numpy as np
+
+from report.data import Event, EventList
+
+class EventColumns:
+    """
+    Struct-of-arrays storage for the events of a report.
+    Every row has a value in each column; missing values are stored as MISSING.
+    Rows are kept as raw dicts (or events) and only become Event objects when read.
+    """
+    MISSING = -1
+
+    # column name: key in the raw event data
+    COLUMNS = {
+        'time': 'timestamp',
+        'source': 'sourceID',
+        'target': 'targetID',
+        'fight': 'fight',
+        'abilityGameID': 'abilityGameID',
+        'amount': 'amount',
+        'hitType': 'hitType',
+        'stacks': 'stacks',
+        'duration': 'duration',
+    }
+
+    def __init__(self, rows: list[dict[str, Any] | Event]) -> None:
+        self._rows = rows
+        self._events = [None] * len(rows) # materialized events, filled on access
+        self.type_codes = dict() # type name: code
+        self.type_names = list() # code: type name
+
+        # each column is gathered as a Python list and converted once
+        M = self.MISSING
+        if all(isinstance(row, dict) for row in rows):
+            types = [row['type'] for row in rows]
+            columns = {name: [row.get(key, M) for row in rows] for name, key in self.COLUMNS.items()}
+        else:
+            # events are already materialized; dicts among them are read by key
+            for i, row in enumerate(rows):
+                if isinstance(row, Event):
+                    self._events[i] = row
+            get = lambda row, name, key: getattr(row, name, M) if isinstance(row, Event) else row.get(key, M)
+            types = [row.type_ if isinstance(row, Event) else row['type'] for row in rows]
+            columns = {name: [get(row, name, key) for row in rows] for name, key in self.COLUMNS.items()}
+
+        for type_name in dict.fromkeys(types):
+            self.type_code(type_name)
+        codes = self.type_codes
+        self.type_ = np.array([codes[t] for t in types], dtype=np.int16)
+        columns = {name: np.array(values, dtype=np.int64) for name, values in columns.items()}
+
+        self.__dict__.update(columns)
+
+    @classmethod
+    def from_events(cls, events: Iterable[Event]) -> EventColumns:
+        return cls(list(events))
+
+    def type_code(self, type_name: str) -> int:
+        """Code for a type name, assigning a new one if needed"""
+        if (code:=self.type_codes.get(type_name)) is None:
+            code = len(self.type_names)
+            self.type_codes[type_name] = code
+            self.type_names.append(type_name)
+        return code
+
+    def event(self, row: int) -> Event:
+        """Event for a row, created on first access"""
+        if (event:=self._events[row]) is None:
+            event = Event(self._rows[row])
+            self._events[row] = event
+        return event
+
+    def __len__(self):
+        return len(self._rows)
+
+class ColumnarEventList(EventList):
+    """
+    EventList backed by EventColumns. Holds an array of row numbers into the columns,
+    and answers filters with vectorized masks instead of walking events.
+    """
+    def __init__(self, columns: EventColumns, rows: np.ndarray, report: Report) -> None:
+        self._r = report
+        self._cols = columns
+        self._rows = rows
+
+    @classmethod
+    def from_data(cls, data: list[dict[str, Any]], report: Report) -> ColumnarEventList:
+        """From raw event dicts, as returned by the events query"""
+        columns = EventColumns(data)
+        return cls(columns, np.arange(len(columns)), report)
+
+    @classmethod
+    def from_events(cls, events: Iterable[Event], report: Report) -> ColumnarEventList:
+        columns = EventColumns.from_events(events)
+        return cls(columns, np.arange(len(columns)), report)
+
+    def _column(self, name: str) -> np.ndarray:
+        return getattr(self._cols, name)[self._rows]
+
+    def _masked(self, mask: np.ndarray) -> ColumnarEventList:
+        return self._new(self._rows[mask])
+
+    @property
+    def _ls(self) -> list[Event]:
+        return [self._cols.event(i) for i in self._rows]
+
+    def to_list(self) -> list[Event]:
+        return self._ls
+
+    def to_events(self) -> EventList:
+        """Materializes into a plain EventList"""
+        return EventList(self._ls, self._r)
+
+    def types(self, types: str | list[str]) -> ColumnarEventList:
+        if isinstance(types, str):
+            types = [types]
+        codes = [self._cols.type_codes[t] for t in types if t in self._cols.type_codes]
+        return self._masked(np.isin(self._column('type_'), codes))
+
+    def in_fights(self, fight_ids: int | list[int]) -> ColumnarEventList:
+        if isinstance(fight_ids, int):
+            fight_ids = [fight_ids]
+        return self._masked(np.isin(self._column('fight'), fight_ids))
+
+    def ability(self, ability_name: str | list(str)) -> ColumnarEventList:
+        if isinstance(ability_name, str):
+            ability_name = [ability_name]
+
+        ability_ids = []
+        for a in ability_name:
+            ability_ids += self._r.get_ability(a)
+        return self._masked(np.isin(self._column('abilityGameID'), ability_ids))
+
+    def by(self, names: str | list[str]) -> ColumnarEventList:
+        return self._masked(np.isin(self._column('target'), list(self._named_ids(names))))
+
+    def by_id(self, actor_id: int) -> ColumnarEventList:
+        return self._masked(self._column('source') == actor_id)
+
+    def by_players(self) -> ColumnarEventList:
+        return self._masked(np.isin(self._column('source'), self._r.get_actor_ids_of_type('Player')))
+
+    def by_npcs(self) -> ColumnarEventList:
+        return self._masked(np.isin(self._column('source'), self._r.get_actor_ids_of_type('NPC')))
+
+    def to(self, names: str | list[str]) -> ColumnarEventList:
+        return self._masked(np.isin(self._column('target'), list(self._named_ids(names))))
+
+    def to_players(self) -> ColumnarEventList:
+        return self._masked(np.isin(self._column('target'), self._r.get_actor_ids_of_type('Player')))
+
+    def to_npcs(self) -> ColumnarEventList:
+        return self._masked(np.isin(self._column('target'), self._r.get_actor_ids_of_type('NPC')))
+
+    def is_sorted(self) -> bool:
+        if self._sorted is None:
+            self._sorted = bool(np.all(np.diff(self._column('time')) >= 0))
+        return self._sorted
+
+    def _new(self, rows: np.ndarray) -> ColumnarEventList:
+        ret = ColumnarEventList(self._cols, rows, self._r)
+        ret._sorted = True if self._sorted else None
+        return ret
+
+    def between(self, start_time: int, end_time: int) -> ColumnarEventList:
+        if self.is_sorted():
+            times = self._column('time')
+            lo = np.searchsorted(times, start_time, side='left')
+            hi = np.searchsorted(times, end_time, side='right')
+            return self._new(self._rows[lo:max(lo, hi)])
+        times = self._column('time')
+        return self._masked((times >= start_time) & (times <= end_time))
+
+    def before(self, event: Event) -> ColumnarEventList:
+        return self.between(np.iinfo(np.int64).min, event.time)
+
+    def after(self, event: Event) -> ColumnarEventList:
+        return self.between(event.time, np.iinfo(np.int64).max)
+
+    def to_sources(self) -> list[int]:
+        return self._column('source').tolist()
+
+    def to_targets(self) -> list[int]:
+        return self._column('target').tolist()
+
+    def sort_time(self, *, reverse=False) -> ColumnarEventList:
+        order = np.argsort(self._column('time'), kind='stable')
+        self._rows = self._rows[order[::-1] if reverse else order]
+        self._sorted = True if not reverse else None
+        return self
+
+    def sort_phase(self) -> ColumnarEventList:
+        return self._sort_by(self._r.pm.phase)
+
+    def sort_phase_time(self) -> ColumnarEventList:
+        return self._sort_by(self._r.pm.phase_time)
+
+    def _sort_by(self, key: Callable) -> ColumnarEventList:
+        keys = [key(e) for e in self]
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self._rows = self._rows[order]
+        self._sorted = None
+        return self
+
+    def filter(self, func: Callable) -> ColumnarEventList:
+        mask = np.fromiter((bool(func(e)) for e in self), dtype=bool, count=len(self))
+        return self._masked(mask)
+
+    def where(self, expression: str) -> ColumnarEventList:
+        from report.filters import Filter, FilterError
+        compiled = Filter(expression, self._r)
+        try:
+            return self._masked(compiled.mask(self))
+        except FilterError: # a field without a column
+            return self.filter(compiled.predicate())
+
+    def __iter__(self):
+        return (self._cols.event(i) for i in self._rows)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __reversed__(self):
+        self._rows = self._rows[::-1]
+        self._sorted = None
+        return self
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._new(self._rows[index])
+        else:
+            return self._cols.event(self._rows[index])
+
+    def __setitem__(self, index, data):
+        raise TypeError('ColumnarEventList is read-only')
+
+    def __add__(self, other: EventList) -> EventList:
+        if self._r is not other._r:
+            raise ValueError('Attempting to add events from different reports')
+        if isinstance(other, ColumnarEventList) and other._cols is self._cols:
+            ret = self._new(np.concatenate([self._rows, other._rows]))
+            ret._sorted = None
+            return ret
+        return EventList(self._ls + other.to_list(), self._r)
@@ -0,0 +1,98 @@
+from __future__ import annotations
+from typing import Any
+
+import numpy as np
+
+class Coverage:
+    """
+    Which players had which auras over time, for one fight.
+    Time is cut into bins of resolution ms from start_time; a bin is covered if the aura was
+    active at its first ms. Stored bit-packed: bits[player, aura] holds one bit per bin.
+    Rows are players (actor ids) and columns are auras (names or ids, as asked for).
+    """
+    def __init__(self, bits: np.ndarray, players: list[int], auras: list[str | int],
+        start_time: int, resolution: int, bins: int) -> None:
+        self.bits = bits
+        self.players = players
+        self.auras = auras
+        self.start_time = start_time
+        self.resolution = resolution
+        self.bins = bins
+
+    @classmethod
+    def from_intervals(cls, intervals: dict[tuple[int, int], list[tuple[float, float]]],
+        players: list[int], auras: list[str | int], start_time: int, end_time: int,
+        resolution: int=100) -> Coverage:
+        """
+        intervals is {(player row, aura column): [(start, end)]}, half-open times in ms.
+        Bins run from start_time up to end_time.
+        """
+        bins = max(0, -(-(end_time - start_time) // resolution))
+        # +1 at the first bin of an interval, -1 at the first bin after it
+        edges = np.zeros((len(players), len(auras), bins + 1), dtype=np.int32)
+        for (row, column), spans in intervals.items():
+            for start, end in spans:
+                first = max(0, -(-(start - start_time) // resolution))
+                last = bins if end == float('inf') else min(bins, -(-(end - start_time) // resolution))
+                if first < last:
+                    edges[row, column, int(first)] += 1
+                    edges[row, column, int(last)] -= 1
+        dense = np.cumsum(edges[..., :bins], axis=-1) > 0
+        return cls(np.packbits(dense, axis=-1), players, auras, start_time, resolution, bins)
+
+    def __repr__(self) -> str:
+        return f'Coverage({len(self.players)} players x {len(self.auras)} auras x {self.bins} bins of {self.resolution}ms)'
+
+    def _column(self, aura: str | int) -> int:
+        try:
+            return self.auras.index(aura)
+        except ValueError:
+            raise KeyError(f'Aura not tracked: {aura}') from None
+
+    def _row(self, player: int) -> int:
+        try:
+            return self.players.index(player)
+        except ValueError:
+            raise KeyError(f'Player not tracked: {player}') from None
+
+    def _unpack(self, bits: np.ndarray) -> np.ndarray:
+        return np.unpackbits(bits, axis=-1, count=self.bins).astype(bool)
+
+    def covered(self, aura: str | int, player: int=None) -> np.ndarray:
+        """Bool per bin; per player and bin if no player is given"""
+        bits = self.bits[:, self._column(aura)]
+        if player is not None:
+            bits = bits[self._row(player)]
+        return self._unpack(bits)
+
+    def uptime(self, aura: str | int, player: int=None) -> float | dict[int, float]:
+        """Fraction of bins an aura was on a player, or {player: fraction} for all players"""
+        if self.bins == 0:
+            return 0.0 if player is not None else {p: 0.0 for p in self.players}
+        counts = np.unpackbits(self.bits[:, self._column(aura)], axis=-1, count=self.bins).sum(axis=-1)
+        if player is not None:
+            return float(counts[self._row(player)]) / self.bins
+        return {p: float(c) / self.bins for p, c in zip(self.players, counts)}
+
+    def overlap(self, aura: str | int) -> np.ndarray:
+        """Number of players with an aura, per bin"""
+        return self.covered(aura).sum(axis=0)
+
+    def all_covered(self, aura: str | int) -> np.ndarray:
+        """Bool per bin, whether every player had an aura"""
+        bits = self.bits[:, self._column(aura)]
+        if len(self.players) == 0:
+            return np.zeros(self.bins, dtype=bool)
+        return self._unpack(np.bitwise_and.reduce(bits, axis=0))
+
+    def all_covered_uptime(self, aura: str | int) -> float:
+        """Fraction of bins every player had an aura"""
+        return float(self.all_covered(aura).mean()) if self.bins else 0.0
+
+    def between(self, start_time: int, end_time: int) -> Coverage:
+        """Coverage of the bins starting from start_time up to before end_time"""
+        first = max(0, -(-(start_time - self.start_time) // self.resolution))
+        last = min(self.bins, max(first, -(-(end_time - self.start_time) // self.resolution)))
+        dense = np.unpackbits(self.bits, axis=-1, count=self.bins)[..., first:last]
+        return Coverage(np.packbits(dense, axis=-1), self.players, self.auras,
+            self.start_time + first * self.resolution, self.resolution, last - first)
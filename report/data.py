@@ -2,30 +2,79 @@ from __future__ import annotations
 from typing import Callable, Any
 
 import json
+from sys import intern
 from math import floor
 from dataclasses import dataclass
+from bisect import bisect_left, bisect_right
+from itertools import chain
+import heapq
+
+from report.index import EventIndex
 
 class Event:
+    """
+    One event of a report. Fields every event has, and the common optional ones, live in slots.
+    Optional fields missing from the event are left unset, so hasattr() still tells if an event has them.
+    Anything else goes in a small overflow dict that is only created when needed.
+    """
     time: int
     type_: str
     source: int
     target: int
     fight: int
 
+    # optional fields, stored under the same name as in the event data.
+    # Includes the fields of damage, heal and cast events, which are most of a report
+    OPTIONAL = (
+        'abilityGameID', 'amount', 'hitType', 'stacks', 'duration', 'targetable',
+        'extraAbilityGameID', 'sourceInstance', 'targetInstance',
+        'packetID', 'unmitigatedAmount', 'multiplier', 'absorbed', 'mitigated', 'overheal',
+        'directHit', 'tick', 'sourceResources', 'targetResources')
+
+    __slots__ = ('time', 'type_', 'source', 'target', 'fight', '_extra') + OPTIONAL
+
     def __init__(self, data: Dict[str, Any]) -> None:
-        self.time = data.pop('timestamp')
-        self.type_ = data.pop('type')
-        self.source = data.pop('sourceID', -1)
-        self.target = data.pop('targetID', -1)
-        self.fight = data.pop('fight')
-        self.__dict__.update(data) 
+        # reads data without changing it, so cached query results can be shared
+        _set(self, 'time', data['timestamp'])
+        _set(self, 'type_', intern(data['type']))
+        _set(self, 'source', data.get('sourceID', -1))
+        _set(self, 'target', data.get('targetID', -1))
+        _set(self, 'fight', data['fight'])
+
+        extra = None
+        for k, v in data.items():
+            if k in _OPTIONAL:
+                _set(self, k, v)
+            elif k not in _BASE:
+                if extra is None:
+                    extra = dict()
+                extra[k] = v
+        _set(self, '_extra', extra)
+
+    def __getattr__(self, name: str) -> Any:
+        # only reached for unset slots and names that aren't slots
+        if name != '_extra' and (extra:=getattr(self, '_extra', None)) and name in extra:
+            return extra[name]
+        raise AttributeError(f"'Event' object has no attribute '{name}'")
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name in _SLOTS:
+            _set(self, name, value)
+        else:
+            if self._extra is None:
+                _set(self, '_extra', dict())
+            self._extra[name] = value
 
     def __str__(self):
         return str(json.dumps(self.to_dict(), indent=2))
 
     def to_dict(self):
-        renamed = ['time', 'type_', 'source', 'target']
-        etc = {k:v for k,v in self.__dict__.items() if k not in renamed}
+        etc = {'fight': self.fight}
+        for k in self.OPTIONAL:
+            if hasattr(self, k):
+                etc[k] = getattr(self, k)
+        if self._extra:
+            etc |= self._extra
 
         return {
             'timestamp':self.time,
@@ -43,20 +92,113 @@ class Event:
             'targetID': -1,
             'fight': fight})
 
+_set = object.__setattr__
+_SLOTS = frozenset(Event.__slots__)
+_OPTIONAL = frozenset(Event.OPTIONAL)
+_BASE = frozenset(('timestamp', 'type', 'sourceID', 'targetID', 'fight')) # keys read into the base fields
+
+def _time(event: Event) -> int:
+    return event.time
+
+class Step:
+    """One filter in an EventList query plan. Cheaper, more selective steps run first"""
+    KEY = 0 # equality on type or ability, the most selective fields
+    FIELD = 1 # equality on actor or fight
+    RANGE = 2 # time comparison
+    CUSTOM = 3 # user supplied function
+
+    def __init__(self, name: str, arg: Any, predicate: Callable[[Event], bool], cost: int,
+        key: tuple[str, set] = None, window: tuple[int, int] = None) -> None:
+        self.name = name
+        self.arg = arg
+        self.predicate = predicate
+        self.cost = cost
+        self.key = key # (event field, values), if the step can be answered by an EventIndex
+        self.window = window # (first, last) inclusive times, None if unbounded. Time ranges only
+
+    def __repr__(self):
+        if self.arg is None:
+            return f'{self.name}()'
+        if callable(self.arg):
+            return f'{self.name}({getattr(self.arg, "__name__", self.arg)})'
+        if isinstance(self.arg, set):
+            return f'{self.name}({sorted(self.arg, key=str)})'
+        return f'{self.name}({self.arg!r})'
+
 class EventList:
     """Wrapper around a list of events. Contains reference to report"""
+    _index = None # EventIndex over self._ls, see build_index()
+    _sorted = None # whether self._ls is in time order; None if not yet known
+
+    def is_sorted(self) -> bool:
+        """Whether the events are in time order. Checked once, then tracked through reorders"""
+        if self._sorted is None:
+            ls = self._ls
+            self._sorted = all(ls[i].time <= ls[i+1].time for i in range(len(ls)-1))
+        return self._sorted
+
+    def _window(self, start_time: int | None, end_time: int | None) -> tuple[int, int]:
+        """Slice bounds of events with start_time <= time <= end_time. Needs is_sorted()"""
+        ls = self._ls
+        lo = 0 if start_time is None else bisect_left(ls, start_time, key=_time)
+        hi = len(ls) if end_time is None else bisect_right(ls, end_time, key=_time)
+        return lo, max(lo, hi)
+
     def __init__(self, ls: List[Event], report: Report) -> None:
         self._r = report
         self._ls = ls
 
+    @classmethod
+    def merge(cls, *event_lists: EventList) -> EventList:
+        """
+        Merges EventLists into one in time order, in O(total * log(len(event_lists))).
+        Lists that aren't sorted are sorted first. Events with equal times keep the order of the arguments.
+        Named views give a named view of the merged events.
+        """
+        if not event_lists:
+            raise ValueError('Nothing to merge')
+        report = event_lists[0]._r
+        if any(ls._r is not report for ls in event_lists):
+            raise ValueError('Attempting to merge events from different reports')
+
+        named = any(isinstance(ls, NamedEventList) for ls in event_lists)
+        sources = list()
+        for ls in event_lists:
+            if isinstance(ls, NamedEventList):
+                ls = ls.to_events()
+            sources.append(ls if ls.is_sorted() else sorted(ls, key=_time))
+
+        ret = EventList(list(heapq.merge(*sources, key=_time)), report)
+        ret._sorted = True
+        return NamedEventList(ret) if named else ret
+
+    def build_index(self) -> EventList:
+        """Index the events so filters on type, ability and actors skip the scan"""
+        self._index = EventIndex(self._ls)
+        return self
+
     def to_list(self) -> List:
         return self._ls
 
+    def explain(self) -> str:
+        """Description of how the events are computed. See LazyEventList"""
+        return f'{len(self)} events'
+
+    def to_columnar(self) -> ColumnarEventList:
+        """Copy of the events in the column-oriented backend. Requires numpy"""
+        from report.columnar import ColumnarEventList
+        return ColumnarEventList.from_events(self._ls, self._r)
+
+    def _where(self, step: Step) -> EventList:
+        """Deferred filter; the events are scanned once the result is used"""
+        return LazyEventList(self, [step])
+
     def types(self, types: str | list[str]) -> EventList:
         if isinstance(types, str):
             types = [types]
-        new_list = [e for e in self._ls if e.type_ in types]
-        return EventList(new_list, self._r)
+        types = set(types)
+        return self._where(Step('types', types, lambda e: e.type_ in types, Step.KEY,
+            ('type_', types)))
 
     def in_phases(self, phases: str | list[str]) -> EventList:
         if isinstance(phases, str):
@@ -67,80 +209,82 @@ class EventList:
     def in_fights(self, fight_ids: int | list[int]) -> EventList:
         if isinstance(fight_ids, int):
             fight_ids = [fight_ids]
-        new_list = [e for e in self._ls if e.fight in fight_ids]
-        return EventList(new_list, self._r)
+        fight_ids = set(fight_ids)
+        return self._where(Step('in_fights', fight_ids, lambda e: e.fight in fight_ids, Step.FIELD,
+            ('fight', fight_ids)))
 
     def ability(self, ability_name: str | list(str)) -> EventList:
         if isinstance(ability_name, str):
             ability_name = [ability_name]
         
-        ability_ids = []
+        ability_ids = set()
         for a in ability_name:
-            ability_ids += self._r.get_ability(a)
+            ability_ids.update(self._r.get_ability(a))
 
-        new_list = filter(lambda x: hasattr(x, 'abilityGameID'), self._ls)
-        new_list = [e for e in new_list if e.abilityGameID in ability_ids]
-        return EventList(new_list, self._r)
+        return self._where(Step('ability', ability_ids,
+            lambda e: getattr(e, 'abilityGameID', None) in ability_ids, Step.KEY,
+            ('abilityGameID', ability_ids)))
 
     def casts(self, ability_name: str | list(str)):
         return self.ability(ability_name).types("cast")
 
-    def by(self, names: str) -> EventList:
-        if len(self)==0:
-            return EventList(list(), self._r)
-        
+    def _named_ids(self, names: str | list[str]) -> set[int]:
         if not isinstance(names, list):
             names = [names]
 
-        all_ids = []
+        all_ids = set()
         for name in names:
-            actor_ids = self._r.get_actor_ids(name)
-            all_ids += actor_ids
-        
-        new_list = [e for e in self._ls if e.target in all_ids]
-        return EventList(new_list, self._r)
+            all_ids.update(self._r.get_actor_ids(name))
+        return all_ids
+
+    def by(self, names: str | list[str]) -> EventList:
+        all_ids = self._named_ids(names)
+        return self._where(Step('by', all_ids, lambda e: e.target in all_ids, Step.FIELD,
+            ('target', all_ids)))
 
     def by_id(self, actor_id: int) -> EventList:
-        new_list = [e for e in self._ls if e.source is actor_id]
-        return EventList(new_list, self._r)
+        return self._where(Step('by_id', actor_id, lambda e: e.source == actor_id, Step.FIELD,
+            ('source', [actor_id])))
 
     def by_players(self) -> EventList:
-        new_list = [e for e in self._ls if self._r.get_actor(e.source).type_=='Player']
-        return EventList(new_list, self._r)
+        ids = set(self._r.get_actor_ids_of_type('Player'))
+        return self._where(Step('by_players', None, lambda e: e.source in ids, Step.FIELD,
+            ('source', ids)))
 
     def by_npcs(self) -> EventList:
-        new_list = [e for e in self._ls if self._r.get_actor(e.source).type_=='NPC']
-        return EventList(new_list, self._r)
+        ids = set(self._r.get_actor_ids_of_type('NPC'))
+        return self._where(Step('by_npcs', None, lambda e: e.source in ids, Step.FIELD,
+            ('source', ids)))
 
     def to(self, names: str | list[str]) -> EventList:
-        if len(self)==0:
-            return EventList(list(), self._r)
-        if not isinstance(names, list):
-            names = [names]
-
-        all_ids = []
-        for name in names:
-            actor_ids = self._r.get_actor_ids(name)
-            all_ids += actor_ids
-        
-        new_list = [e for e in self._ls if e.target in all_ids]
-        return EventList(new_list, self._r)
+        all_ids = self._named_ids(names)
+        return self._where(Step('to', all_ids, lambda e: e.target in all_ids, Step.FIELD,
+            ('target', all_ids)))
 
     def to_players(self) -> EventList:
-        new_list = [e for e in self._ls if self._r.get_actor(e.target).type_=='Player']
-        return EventList(new_list, self._r)
+        ids = set(self._r.get_actor_ids_of_type('Player'))
+        return self._where(Step('to_players', None, lambda e: e.target in ids, Step.FIELD,
+            ('target', ids)))
 
     def to_npcs(self) -> EventList:
-        new_list = [e for e in self._ls if self._r.get_actor(e.target).type_=='NPC']
-        return EventList(new_list, self._r)
+        ids = set(self._r.get_actor_ids_of_type('NPC'))
+        return self._where(Step('to_npcs', None, lambda e: e.target in ids, Step.FIELD,
+            ('target', ids)))
 
     def before(self, event: Event) -> EventList:
-        new_list = [e for e in self._ls if e.time <= event.time]
-        return EventList(new_list, self._r)
+        time = event.time
+        return self._where(Step('before', time, lambda e: e.time <= time, Step.RANGE,
+            window=(None, time)))
 
     def after(self, event: Event) -> EventList:
-        new_list = [e for e in self._ls if e.time >= event.time]
-        return EventList(new_list, self._r)
+        time = event.time
+        return self._where(Step('after', time, lambda e: e.time >= time, Step.RANGE,
+            window=(time, None)))
+
+    def between(self, start_time: int, end_time: int) -> EventList:
+        """Events with start_time <= time <= end_time"""
+        return self._where(Step('between', (start_time, end_time),
+            lambda e: start_time <= e.time <= end_time, Step.RANGE, window=(start_time, end_time)))
 
     def to_sources(self) -> list(int | str):
         return [e.source for e in self._ls]
@@ -149,20 +293,42 @@ class EventList:
         return [e.target for e in self._ls]
 
     def sort_time(self, *, reverse=False) -> EventList:
-        self._ls.sort(key=lambda i: i.time, reverse=reverse)
+        if not reverse and self._sorted:
+            return self
+        self._index = None
+        self._ls.sort(key=_time, reverse=reverse)
+        self._sorted = True if not reverse else None
         return self
 
+    # reorders read self._ls before clearing _sorted: resolving a LazyEventList sets it
+
     def sort_phase(self) -> EventList:
-        self._ls.sort(key=lambda i: self._r.pm.phase(i))
+        ls = self._ls
+        self._index = None
+        self._sorted = None
+        ls.sort(key=lambda i: self._r.pm.phase(i))
         return self
 
     def sort_phase_time(self) -> EventList:
-        self._ls.sort(key=lambda i: (self._r.pm.phase_time(i)))
+        ls = self._ls
+        self._index = None
+        self._sorted = None
+        ls.sort(key=lambda i: (self._r.pm.phase_time(i)))
         return self
 
     def filter(self, func: Callable) -> EventList:
-        new_list = [*filter(func, self._ls)]
-        return EventList(new_list, self._r)
+        return self._where(Step('filter', func, func, Step.CUSTOM))
+
+    def where(self, expression: str) -> EventList:
+        """
+        Events matching an FFLogs filter expression, e.g. type='cast' AND ability.name='X',
+        evaluated locally. Raises FilterError for what report.filters can't evaluate.
+        """
+        from report.filters import Filter
+        ret = self
+        for step in Filter(expression, self._r).steps():
+            ret = ret._where(step)
+        return ret
 
     def links(self, offset: int=0) -> list[tuple[str, int, int]]:
         link_ls = list()
@@ -172,24 +338,9 @@ class EventList:
             link_ls.append((f'{self._r._to_output(time)}', event.fight, event.time))
         return link_ls
 
-    def named(self) -> EventList:
-        new_list = list()
-        for event in self._ls:
-            # create new
-            new_event = Event(event.to_dict())
-            new_list.append(new_event)
-
-            new_event.source = self._r.get_actor(event.source).name
-            new_event.target = self._r.get_actor(event.target).name
-            new_event.fighttime = event.time - self._r.fight(event.fight).start_time
-
-            try:
-                new_event.abilityGameID = self._r.get_ability(event.abilityGameID)
-                new_event.extraAbilityGameID = self._r.get_ability(event.extraAbilityGameID)
-            except AttributeError:
-                continue
-
-        return EventList(new_list, self._r)
+    def named(self) -> NamedEventList:
+        """View with actor and ability names and fight time resolved on access"""
+        return NamedEventList(self)
 
     def print(self) -> EventList:
         for e in self._ls:
@@ -243,7 +394,10 @@ class EventList:
         return self._ls.__len__()
 
     def __reversed__(self):
-        self._ls = list(reversed(self._ls))
+        ls = list(reversed(self._ls))
+        self._index = None
+        self._sorted = None
+        self._ls = ls
         return self 
 
     def __getitem__(self, index):
@@ -253,12 +407,429 @@ class EventList:
             return self._ls.__getitem__(index)
 
     def __setitem__(self, index, data):
-        self._ls.__setitem__(index, data)
+        ls = self._ls
+        self._index = None
+        self._sorted = None
+        ls.__setitem__(index, data)
 
     def __add__(self, other: EventList) -> EventList:
         if self._r is not other._r:
             raise ValueError('Attempting to add events from different reports')
-        return EventList(self._ls + other._ls, self._r)
+        ret = EventList(self._ls + other._ls, self._r)
+        # sorted halves make a sorted whole only if they don't overlap
+        ret._sorted = self.is_sorted() and other.is_sorted() and \
+            (len(self)==0 or len(other)==0 or self._ls[-1].time <= other._ls[0].time)
+        return ret
+
+class LazyEventList(EventList):
+    """
+    EventList whose events are the result of a query plan over a source EventList.
+    Filters only add steps to the plan. The plan runs as a single pass over the source
+    the first time the events are needed: iteration, indexing, len(), etc.
+    """
+    def __init__(self, source: EventList, plan: list[Step]) -> None:
+        self._r = source._r
+        self._source = source
+        self._plan = plan
+        self._result = None
+        # filtering keeps the order of the source
+        self._sorted = True if source._sorted else None
+
+    def _where(self, step: Step) -> EventList:
+        # once resolved, the events may have been reordered in place; build on them
+        if self._result is not None:
+            resolved = EventList(self._result, self._r)
+            resolved._sorted = self._sorted
+            return LazyEventList(resolved, [step])
+        return LazyEventList(self._source, self._plan + [step])
+
+
+    def _ordered_plan(self) -> list[Step]:
+        # stable, so steps of equal cost keep the order they were written in
+        return sorted(self._plan, key=lambda step: step.cost)
+
+    def _run(self) -> list[Event]:
+        plan = self._ordered_plan()
+        source = self._source
+        ls = source.to_list()
+        lo, hi = 0, len(ls)
+
+        # time ranges on a sorted source become a slice, found by binary search
+        windows = [step for step in plan if step.window is not None]
+        if windows and source.is_sorted():
+            start_time = max((w.window[0] for w in windows if w.window[0] is not None), default=None)
+            end_time = min((w.window[1] for w in windows if w.window[1] is not None), default=None)
+            lo, hi = source._window(start_time, end_time)
+            plan = [step for step in plan if step not in windows]
+
+        # equality steps are answered by intersecting posting lists of the index
+        keyed = list()
+        if (index:=source._index) is not None:
+            keyed = [step for step in plan if step.key is not None and index.has(step.key[0])]
+
+        if keyed:
+            rows = index.rows([step.key for step in keyed])
+            rows = rows[bisect_left(rows, lo):bisect_left(rows, hi)]
+            candidates = [ls[i] for i in rows]
+            plan = [step for step in plan if step not in keyed]
+        elif (lo, hi) != (0, len(ls)):
+            candidates = ls[lo:hi]
+        else:
+            candidates = ls
+
+        predicates = [step.predicate for step in plan]
+        if len(predicates) == 0:
+            return list(candidates)
+        if len(predicates) == 1:
+            return [*filter(predicates[0], candidates)]
+
+        def fused(e: Event) -> bool:
+            for predicate in predicates:
+                if not predicate(e):
+                    return False
+            return True
+
+        return [*filter(fused, candidates)]
+
+    @property
+    def _ls(self) -> list[Event]:
+        if self._result is None:
+            self._result = self._run()
+            if self._source._sorted:
+                self._sorted = True
+        return self._result
+
+    @_ls.setter
+    def _ls(self, ls: list[Event]) -> None:
+        self._result = ls
+
+    def explain(self) -> str:
+        """Description of the plan, in the order the steps run"""
+        index = self._source._index
+        lines = [f'scan {len(self._source)} events']
+        for i, step in enumerate(self._ordered_plan(), 1):
+            note = ''
+            if index is not None and step.key is not None and index.has(step.key[0]):
+                note = ' [index]'
+            elif step.window is not None and self._source._sorted:
+                note = ' [bisect]'
+            lines.append(f'  {i}. {step!r}{note}')
+        if self._result is not None:
+            lines.append(f'resolved: {len(self._result)} events')
+        return '\n'.join(lines)
+
+class ChainedEventList(EventList):
+    """
+    Concatenation of EventLists, e.g. every fight of a report, that doesn't copy them into one list.
+    Filters run on each part and give another chain. Reordering copies the events into
+    a single list owned by the chain; the parts are never modified.
+    """
+    def __init__(self, parts: list[EventList], report: Report) -> None:
+        self._r = report
+        self._parts = parts
+        self._owned = False # whether self._parts is a single list private to this chain
+        self._flat = None # cached concatenation
+
+    def _each(self, method: str, *args, **kwargs) -> ChainedEventList:
+        return ChainedEventList([getattr(part, method)(*args, **kwargs) for part in self._parts], self._r)
+
+    def _own(self) -> EventList:
+        """The events as one list private to this chain, for reordering"""
+        if not self._owned:
+            part = EventList(list(self._ls), self._r)
+            part._sorted = self._sorted
+            self._parts = [part]
+            self._owned = True
+            self._flat = None
+        return self._parts[0]
+
+    @property
+    def _ls(self) -> list[Event]:
+        if len(self._parts) == 1:
+            return self._parts[0].to_list()
+        if self._flat is None:
+            self._flat = list(chain.from_iterable(self._parts))
+        return self._flat
+
+    @property
+    def _sorted(self) -> bool | None:
+        if len(self._parts) == 1:
+            return self._parts[0]._sorted
+        return None
+
+    def is_sorted(self) -> bool:
+        last = None
+        for part in self._parts:
+            if len(part) == 0:
+                continue
+            if not part.is_sorted() or (last is not None and last > part[0].time):
+                return False
+            last = part[-1].time
+        return True
+
+    def explain(self) -> str:
+        lines = [f'chain of {len(self._parts)} lists']
+        for part in self._parts:
+            lines += ['  ' + line for line in part.explain().splitlines()]
+        return '\n'.join(lines)
+
+    def types(self, types: str | list[str]) -> ChainedEventList:
+        return self._each('types', types)
+
+    def in_fights(self, fight_ids: int | list[int]) -> ChainedEventList:
+        return self._each('in_fights', fight_ids)
+
+    def ability(self, ability_name: str | list(str)) -> ChainedEventList:
+        return self._each('ability', ability_name)
+
+    def by(self, names: str | list[str]) -> ChainedEventList:
+        return self._each('by', names)
+
+    def by_id(self, actor_id: int) -> ChainedEventList:
+        return self._each('by_id', actor_id)
+
+    def by_players(self) -> ChainedEventList:
+        return self._each('by_players')
+
+    def by_npcs(self) -> ChainedEventList:
+        return self._each('by_npcs')
+
+    def to(self, names: str | list[str]) -> ChainedEventList:
+        return self._each('to', names)
+
+    def to_players(self) -> ChainedEventList:
+        return self._each('to_players')
+
+    def to_npcs(self) -> ChainedEventList:
+        return self._each('to_npcs')
+
+    def before(self, event: Event) -> ChainedEventList:
+        return self._each('before', event)
+
+    def after(self, event: Event) -> ChainedEventList:
+        return self._each('after', event)
+
+    def between(self, start_time: int, end_time: int) -> ChainedEventList:
+        return self._each('between', start_time, end_time)
+
+    def filter(self, func: Callable) -> ChainedEventList:
+        return self._each('filter', func)
+
+    def where(self, expression: str) -> ChainedEventList:
+        return self._each('where', expression)
+
+    def to_sources(self) -> list[int]:
+        return [i for part in self._parts for i in part.to_sources()]
+
+    def to_targets(self) -> list[int]:
+        return [i for part in self._parts for i in part.to_targets()]
+
+    def sort_time(self, *, reverse=False) -> ChainedEventList:
+        if reverse or not self.is_sorted():
+            self._own().sort_time(reverse=reverse)
+        return self
+
+    def sort_phase(self) -> ChainedEventList:
+        self._own().sort_phase()
+        return self
+
+    def sort_phase_time(self) -> ChainedEventList:
+        self._own().sort_phase_time()
+        return self
+
+    def __iter__(self):
+        return chain.from_iterable(self._parts)
+
+    def __len__(self):
+        return sum(len(part) for part in self._parts)
+
+    def __reversed__(self):
+        reversed(self._own())
+        return self
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return EventList(self._ls[index], self._r)
+        if index < 0:
+            index += len(self)
+        for part in self._parts:
+            if index < (n:=len(part)):
+                return part[index]
+            index -= n
+        raise IndexError('ChainedEventList index out of range')
+
+    def __setitem__(self, index, data):
+        self._own()[index] = data
+
+    def __add__(self, other: EventList) -> ChainedEventList:
+        if self._r is not other._r:
+            raise ValueError('Attempting to add events from different reports')
+        return ChainedEventList(self._parts + [other], self._r)
+
+class NamedEvent:
+    """
+    Read-only view of an event with source, target, abilityGameID and extraAbilityGameID
+    as names, plus fighttime. Other attributes come from the event.
+    """
+    __slots__ = ('event', '_r')
+
+    def __init__(self, event: Event, report: Report) -> None:
+        self.event = event
+        self._r = report
+
+    @property
+    def source(self) -> str:
+        return self._r.get_actor_name(self.event.source, self.event.source)
+
+    @property
+    def target(self) -> str:
+        return self._r.get_actor_name(self.event.target, self.event.target)
+
+    @property
+    def abilityGameID(self) -> str:
+        i = self.event.abilityGameID
+        return self._r.get_ability_name(i, i)
+
+    @property
+    def extraAbilityGameID(self) -> str:
+        i = self.event.extraAbilityGameID
+        return self._r.get_ability_name(i, i)
+
+    @property
+    def fighttime(self) -> int:
+        return self.event.time - self._r.fight(self.event.fight).start_time
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.event, name)
+
+    def __str__(self):
+        return str(json.dumps(self.to_dict(), indent=2))
+
+    def to_dict(self):
+        named = {
+            'sourceID': self.source,
+            'targetID': self.target,
+            'fighttime': self.fighttime}
+        for k in ['abilityGameID', 'extraAbilityGameID']:
+            if hasattr(self.event, k):
+                named[k] = getattr(self, k)
+        return self.event.to_dict() | named
+
+class NamedEventList(EventList):
+    """
+    View of an EventList that yields NamedEvents. Nothing is copied: names are resolved
+    when read, and filters run on the underlying events (by id).
+    Reordering copies the list of references once, never the source list.
+    """
+    def __init__(self, events: EventList) -> None:
+        self._r = events._r
+        self._events = events
+        self._owned = False # whether self._events is private to this view
+
+    def _own(self) -> EventList:
+        """The underlying list, copied first if it may be shared"""
+        if not self._owned:
+            events = EventList(list(self._events.to_list()), self._r)
+            events._sorted = self._events._sorted
+            self._events = events
+            self._owned = True
+        return self._events
+
+    def _where(self, step: Step) -> NamedEventList:
+        return NamedEventList(self._events._where(step))
+
+    def filter(self, func: Callable) -> NamedEventList:
+        # built in steps filter the underlying events by id, but func is given NamedEvents
+        r = self._r
+        return self._where(Step('filter', func, lambda e: func(NamedEvent(e, r)), Step.CUSTOM))
+
+    def _view(self, event: Event) -> NamedEvent:
+        return NamedEvent(event, self._r)
+
+    @property
+    def _ls(self) -> list[NamedEvent]:
+        return [self._view(e) for e in self._events]
+
+    @property
+    def _sorted(self) -> bool | None:
+        return self._events._sorted
+
+    def is_sorted(self) -> bool:
+        return self._events.is_sorted()
+
+    def to_events(self) -> EventList:
+        """The underlying events, with ids"""
+        return self._events
+
+    def named(self) -> NamedEventList:
+        return self
+
+    def in_phases(self, phases: str | list[str]) -> NamedEventList:
+        return NamedEventList(self._events.in_phases(phases))
+
+    # bulk columns
+    def source_names(self) -> list[str]:
+        return self._r.actor_names(self._events.to_sources())
+
+    def target_names(self) -> list[str]:
+        return self._r.actor_names(self._events.to_targets())
+
+    def ability_names(self) -> list[str]:
+        return self._r.ability_names(getattr(e, 'abilityGameID', None) for e in self._events)
+
+    def fight_times(self) -> list[int]:
+        starts = dict()
+        times = list()
+        for e in self._events:
+            if (start:=starts.get(e.fight)) is None:
+                start = starts[e.fight] = self._r.fight(e.fight).start_time
+            times.append(e.time - start)
+        return times
+
+    def to_sources(self) -> list[str]:
+        return self.source_names()
+
+    def to_targets(self) -> list[str]:
+        return self.target_names()
+
+    def sort_time(self, *, reverse=False) -> NamedEventList:
+        if reverse or not self._events._sorted:
+            self._own().sort_time(reverse=reverse)
+        return self
+
+    def sort_phase(self) -> NamedEventList:
+        self._own().sort_phase()
+        return self
+
+    def sort_phase_time(self) -> NamedEventList:
+        self._own().sort_phase_time()
+        return self
+
+    def __iter__(self):
+        return (self._view(e) for e in self._events)
+
+    def __len__(self):
+        return len(self._events)
+
+    def __reversed__(self):
+        reversed(self._own())
+        return self
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return NamedEventList(self._events[index])
+        else:
+            return self._view(self._events[index])
+
+    def __setitem__(self, index, data):
+        if isinstance(data, NamedEvent):
+            data = data.event
+        self._own()[index] = data
+
+    def __add__(self, other: EventList) -> NamedEventList:
+        if isinstance(other, NamedEventList):
+            other = other._events
+        return NamedEventList(self._events + other)
 
 @dataclass
 class Actor:
@@ -300,7 +871,7 @@ class Fight:
         self.end_time=data['endTime']
         self.percent=data['fightPercentage']
         self.last_phase=data['lastPhaseAsAbsoluteIndex']
-        self.players=data['friendlyPlayers']
+        self.players=list(data['friendlyPlayers'])
 
     def __str__(self):
         return str(json.dumps(self.to_dict(), indent=2))
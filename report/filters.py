@@ -0,0 +1,392 @@
+from __future__ import annotations
+from typing import Any, Callable
+
+import re
+from math import floor, ceil
+from functools import lru_cache
+
+from report.data import Event, Step
+
+class FilterError(ValueError):
+    """The expression is malformed, or uses parts of the language not evaluated locally"""
+
+# events of each inCategory() category, by type
+CATEGORIES = {
+    'deaths': {'death'},
+    'damage': {'damage'},
+    'healing': {'heal'},
+    'casts': {'cast'},
+    'begincasts': {'begincast'},
+    'auras': {'applybuff', 'applydebuff', 'removebuff', 'removedebuff', 'refreshbuff', 'refreshdebuff',
+        'applybuffstack', 'applydebuffstack', 'removebuffstack', 'removedebuffstack'},
+    'resources': {'resourcechange'},
+    'interrupts': {'interrupt'},
+    'dispels': {'dispel'},
+}
+
+# filter field: Event attribute
+FIELDS = {
+    'type': 'type_',
+    'timestamp': 'time',
+    'fight': 'fight',
+    'source.id': 'source',
+    'sourceID': 'source',
+    'target.id': 'target',
+    'targetID': 'target',
+    'ability.id': 'abilityGameID',
+    'abilityGameID': 'abilityGameID',
+}
+
+# attributes an equality on can use the event index, and its plan cost
+_KEY_COSTS = {'type_': Step.KEY, 'abilityGameID': Step.KEY, 'source': Step.FIELD, 'target': Step.FIELD,
+    'fight': Step.FIELD}
+
+_TOKEN = re.compile(r'''\s*(?:
+    (?P<number>-?\d+(?:\.\d+)?)|
+    (?P<string>"[^"]*"|'[^']*')|
+    (?P<op><=|>=|!=|=|<|>|\(|\)|,)|
+    (?P<name>[A-Za-z_][\w.]*))''', re.VERBOSE)
+_KEYWORDS = {'and', 'or', 'not', 'in', 'true', 'false'}
+
+def tokenize(expression: str) -> list[tuple[str, Any]]:
+    """(kind, value) tokens, ending with ('end', None). Keywords are lower case"""
+    tokens = list()
+    pos = 0
+    expression = expression.rstrip()
+    while pos < len(expression):
+        if (match:=_TOKEN.match(expression, pos)) is None or match.end() == pos:
+            raise FilterError(f'Unexpected {expression[pos:].strip()[:20]!r} in {expression!r}')
+        pos = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'number':
+            value = float(value) if '.' in value else int(value)
+        elif kind == 'string':
+            value = value[1:-1]
+        elif kind == 'name' and value.lower() in _KEYWORDS:
+            kind, value = 'keyword', value.lower()
+        tokens.append((kind, value))
+    tokens.append(('end', None))
+    return tokens
+
+# syntax tree
+class Compare:
+    def __init__(self, field: str | Call, op: str, value: Any) -> None:
+        self.field = field
+        self.op = op # =, !=, <, <=, >, >=, in, not in
+        self.value = value # tuple for in and not in
+
+    def __str__(self):
+        value = f"({', '.join(map(repr, self.value))})" if isinstance(self.value, tuple) else repr(self.value)
+        return f'{self.field} {self.op} {value}'
+
+class Call:
+    def __init__(self, name: str, args: tuple) -> None:
+        self.name = name
+        self.args = args
+
+    def __str__(self):
+        return f"{self.name}({', '.join(map(repr, self.args))})"
+
+class And:
+    def __init__(self, items: list) -> None:
+        self.items = items
+
+    def __str__(self):
+        return ' AND '.join(f'({i})' if isinstance(i, Or) else str(i) for i in self.items)
+
+class Or:
+    def __init__(self, items: list) -> None:
+        self.items = items
+
+    def __str__(self):
+        return ' OR '.join(str(i) for i in self.items)
+
+class Not:
+    def __init__(self, item) -> None:
+        self.item = item
+
+    def __str__(self):
+        return f'NOT ({self.item})'
+
+class _Parser:
+    """Recursive descent: or > and > not > comparison"""
+    def __init__(self, expression: str) -> None:
+        self.expression = expression
+        self.tokens = tokenize(expression)
+        self.pos = 0
+
+    def peek(self) -> tuple[str, Any]:
+        return self.tokens[self.pos]
+
+    def take(self) -> tuple[str, Any]:
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def accept(self, kind: str, value: Any=None) -> bool:
+        token = self.peek()
+        if token[0] == kind and (value is None or token[1] == value):
+            self.pos += 1
+            return True
+        return False
+
+    def expect(self, kind: str, value: Any=None) -> Any:
+        token = self.take()
+        if token[0] != kind or (value is not None and token[1] != value):
+            raise FilterError(f'Expected {value or kind}, got {token[1]!r} in {self.expression!r}')
+        return token[1]
+
+    def parse(self):
+        tree = self.parse_or()
+        self.expect('end')
+        return tree
+
+    def parse_or(self):
+        items = [self.parse_and()]
+        while self.accept('keyword', 'or'):
+            items.append(self.parse_and())
+        return items[0] if len(items) == 1 else Or(items)
+
+    def parse_and(self):
+        items = [self.parse_not()]
+        while self.accept('keyword', 'and'):
+            items.append(self.parse_not())
+        return items[0] if len(items) == 1 else And(items)
+
+    def parse_not(self):
+        if self.accept('keyword', 'not'):
+            return Not(self.parse_not())
+        if self.accept('op', '('):
+            tree = self.parse_or()
+            self.expect('op', ')')
+            return tree
+        return self.parse_comparison()
+
+    def parse_comparison(self) -> Compare:
+        field = self.expect('name')
+        if self.accept('op', '('):
+            field = Call(field, self.parse_values())
+
+        kind, op = self.peek()
+        if kind == 'op' and op in ('=', '!=', '<', '<=', '>', '>='):
+            self.take()
+            return Compare(field, op, self.parse_value())
+        if self.accept('keyword', 'not'):
+            self.expect('keyword', 'in')
+            self.expect('op', '(')
+            return Compare(field, 'not in', self.parse_values())
+        if self.accept('keyword', 'in'):
+            self.expect('op', '(')
+            return Compare(field, 'in', self.parse_values())
+        if isinstance(field, Call):
+            return Compare(field, '=', True) # e.g. inCategory('deaths')
+        raise FilterError(f'Expected a comparison after {field!r} in {self.expression!r}')
+
+    def parse_values(self) -> tuple:
+        """Comma separated values up to a closing parenthesis"""
+        values = list()
+        if not self.accept('op', ')'):
+            values.append(self.parse_value())
+            while self.accept('op', ','):
+                values.append(self.parse_value())
+            self.expect('op', ')')
+        return tuple(values)
+
+    def parse_value(self) -> Any:
+        kind, value = self.take()
+        if kind in ('number', 'string'):
+            return value
+        if kind == 'keyword' and value in ('true', 'false'):
+            return value == 'true'
+        raise FilterError(f'Expected a value, got {value!r} in {self.expression!r}')
+
+@lru_cache(maxsize=256)
+def parse(expression: str):
+    """Syntax tree of a filter expression"""
+    return _Parser(expression).parse()
+
+
+# compiled form: tests on event attributes
+class Test:
+    """getattr(event, attr) <op> value. Missing attributes are None, which is in no set and compares false"""
+    def __init__(self, attr: str, op: str, value: Any, text: str) -> None:
+        self.attr = attr
+        self.op = op # in, not in, <, <=, >, >=
+        self.value = value # set for in and not in
+        self.text = text
+
+    def negate(self) -> Test:
+        """Only for in and not in; comparisons are false for missing values either way round"""
+        return Test(self.attr, 'not in' if self.op == 'in' else 'in', self.value, f'NOT ({self.text})')
+
+    def predicate(self) -> Callable[[Event], bool]:
+        attr, value = self.attr, self.value
+        match self.op:
+            case 'in':
+                return lambda e: getattr(e, attr, None) in value
+            case 'not in':
+                return lambda e: getattr(e, attr, None) not in value
+            case '<':
+                return lambda e: (v:=getattr(e, attr, None)) is not None and v < value
+            case '<=':
+                return lambda e: (v:=getattr(e, attr, None)) is not None and v <= value
+            case '>':
+                return lambda e: (v:=getattr(e, attr, None)) is not None and v > value
+            case '>=':
+                return lambda e: (v:=getattr(e, attr, None)) is not None and v >= value
+
+    def step(self) -> Step:
+        if self.attr == 'time' and self.op in ('<', '<=', '>', '>='):
+            # event times are whole milliseconds
+            window = {'<': (None, ceil(self.value) - 1), '<=': (None, floor(self.value)),
+                '>': (floor(self.value) + 1, None), '>=': (ceil(self.value), None)}[self.op]
+            return Step('where', self.text, self.predicate(), Step.RANGE, window=window)
+        if self.op == 'in' and self.attr in _KEY_COSTS:
+            return Step('where', self.text, self.predicate(), _KEY_COSTS[self.attr], (self.attr, self.value))
+        return Step('where', self.text, self.predicate(), Step.CUSTOM)
+
+    def mask(self, events: ColumnarEventList) -> np.ndarray:
+        import numpy as np
+        cols = events._cols
+        if self.attr == 'type_':
+            codes = [cols.type_codes[t] for t in self.value if t in cols.type_codes]
+            mask = np.isin(events._column('type_'), codes)
+            return mask if self.op == 'in' else ~mask
+        if self.attr not in cols.COLUMNS:
+            raise FilterError(f'No column for {self.attr}')
+        column = events._column(self.attr)
+        match self.op:
+            case 'in':
+                return np.isin(column, [v for v in self.value if isinstance(v, (int, float))])
+            case 'not in':
+                return ~np.isin(column, [v for v in self.value if isinstance(v, (int, float))])
+        present = column != cols.MISSING
+        match self.op:
+            case '<':
+                return present & (column < self.value)
+            case '<=':
+                return present & (column <= self.value)
+            case '>':
+                return present & (column > self.value)
+            case '>=':
+                return present & (column >= self.value)
+
+class _AllOf:
+    def __init__(self, items: list) -> None:
+        self.items = items
+
+    def predicate(self) -> Callable[[Event], bool]:
+        predicates = [i.predicate() for i in self.items]
+        return lambda e: all(p(e) for p in predicates)
+
+    def mask(self, events: ColumnarEventList) -> np.ndarray:
+        import numpy as np
+        return np.logical_and.reduce([i.mask(events) for i in self.items] + [np.ones(len(events), dtype=bool)])
+
+class _AnyOf:
+    def __init__(self, items: list) -> None:
+        self.items = items
+
+    def predicate(self) -> Callable[[Event], bool]:
+        predicates = [i.predicate() for i in self.items]
+        return lambda e: any(p(e) for p in predicates)
+
+    def mask(self, events: ColumnarEventList) -> np.ndarray:
+        import numpy as np
+        return np.logical_or.reduce([i.mask(events) for i in self.items] + [np.zeros(len(events), dtype=bool)])
+
+class _NoneOf(_AnyOf):
+    def predicate(self) -> Callable[[Event], bool]:
+        any_of = super().predicate()
+        return lambda e: not any_of(e)
+
+    def mask(self, events: ColumnarEventList) -> np.ndarray:
+        return ~super().mask(events)
+
+class Filter:
+    """
+    A filter expression compiled against a report's actors and abilities.
+    Names (ability.name, source.name, ...) become sets of ids, so every test is on a field of the event.
+    Raises FilterError for expressions it can't evaluate exactly, which the server should answer instead.
+    """
+    def __init__(self, expression: str, report: Report) -> None:
+        self.expression = expression
+        self._r = report
+        self.tree = self._compile(parse(expression))
+
+    def steps(self) -> list[Step]:
+        """EventList plan steps, one per term of a top level AND"""
+        terms = self.tree.items if type(self.tree) is _AllOf else [self.tree]
+        steps = list()
+        for term in terms:
+            if isinstance(term, Test):
+                steps.append(term.step())
+            else:
+                steps.append(Step('where', str(term), term.predicate(), Step.CUSTOM))
+        return steps
+
+    def predicate(self) -> Callable[[Event], bool]:
+        return self.tree.predicate()
+
+    def mask(self, events: ColumnarEventList) -> np.ndarray:
+        """Vectorized over the columns of a ColumnarEventList; FilterError if a field has no column"""
+        return self.tree.mask(events)
+
+    def _compile(self, node):
+        if isinstance(node, And):
+            return _AllOf([self._compile(i) for i in node.items])
+        if isinstance(node, Or):
+            return _AnyOf([self._compile(i) for i in node.items])
+        if isinstance(node, Not):
+            inner = self._compile(node.item)
+            if isinstance(inner, Test) and inner.op in ('in', 'not in'):
+                return inner.negate()
+            return _NoneOf([inner])
+        return self._compare(node)
+
+    def _compare(self, node: Compare) -> Test:
+        text = str(node)
+        op, value = node.op, node.value
+        if isinstance(node.field, Call):
+            return self._call(node.field, op, value, text)
+
+        values = value if isinstance(value, tuple) else (value,)
+        field = node.field
+        if field in FIELDS or field in Event.OPTIONAL:
+            # other fields, e.g. encounterPhase, aren't on local events: the server answers them
+            attr = FIELDS.get(field, field)
+            if op in ('=', '!=', 'in', 'not in'):
+                return Test(attr, 'in' if op in ('=', 'in') else 'not in', set(values), text)
+            if not isinstance(value, (int, float)) or isinstance(value, bool):
+                raise FilterError(f'{op} needs a number: {text!r}')
+            return Test(attr, op, value, text)
+
+        if op not in ('=', '!=', 'in', 'not in'):
+            raise FilterError(f'{field} can only be compared for equality: {text!r}')
+        included = op in ('=', 'in')
+        actor, _, prop = field.partition('.')
+        if field == 'ability.name':
+            ids = set()
+            for name in values:
+                ids.update(self._r.get_ability(str(name)))
+            return Test('abilityGameID', 'in' if included else 'not in', ids, text)
+        # no disposition: it isn't in the master data, and actor types only approximate it
+        if actor in ('source', 'target') and prop in ('name', 'type'):
+            ids = set()
+            for v in values:
+                if prop == 'name':
+                    ids.update(self._r.get_actor_ids(str(v)))
+                else:
+                    ids.update(self._r.get_actor_ids_of_type(str(v)))
+            return Test(actor, 'in' if included else 'not in', ids, text)
+        raise FilterError(f'Unknown field {field!r}')
+
+    def _call(self, call: Call, op: str, value: Any, text: str) -> Test:
+        if call.name.lower() != 'incategory' or len(call.args) != 1:
+            raise FilterError(f'Unknown function {call}')
+        if (types:=CATEGORIES.get(str(call.args[0]).lower())) is None:
+            raise FilterError(f'Unknown category {call.args[0]!r}')
+        if op not in ('=', '!=') or not isinstance(value, bool):
+            raise FilterError(f'{call} compares with true or false: {text!r}')
+        return Test('type_', 'in' if (op == '=') == value else 'not in', types, text)
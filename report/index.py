@@ -0,0 +1,60 @@
+from __future__ import annotations
+from typing import Any, Iterable
+
+from bisect import bisect_left
+from heapq import merge
+
+class EventIndex:
+    """
+    Hash indexes over a list of events: field value -> ascending row numbers (posting list).
+    Row numbers refer to positions in the list the index was built from.
+    """
+    FIELDS = ('type_', 'abilityGameID', 'source', 'target', 'fight')
+
+    def __init__(self, events: list[Event]) -> None:
+        self._postings = {field: dict() for field in self.FIELDS}
+        self._size = len(events)
+        for row, event in enumerate(events):
+            for field, postings in self._postings.items():
+                value = getattr(event, field, None)
+                if value is not None:
+                    postings.setdefault(value, []).append(row)
+
+    def __len__(self):
+        return self._size
+
+    def has(self, field: str) -> bool:
+        return field in self._postings
+
+    def lookup(self, field: str, values: Iterable[Any]) -> list[int]:
+        """Rows where field is one of values, ascending"""
+        postings = self._postings[field]
+        lists = [postings[v] for v in values if v in postings]
+        if len(lists) == 1:
+            return lists[0]
+        # values of a field are distinct, so the lists never share a row
+        return list(merge(*lists))
+
+    def rows(self, keys: list[tuple[str, Iterable[Any]]]) -> list[int]:
+        """Rows matching every (field, values) key: the intersection of their posting lists"""
+        lists = sorted((self.lookup(field, values) for field, values in keys), key=len)
+        rows = lists[0]
+        for other in lists[1:]:
+            rows = self._intersect(rows, other)
+            if not rows:
+                break
+        return rows
+
+    @staticmethod
+    def _intersect(small: list[int], large: list[int]) -> list[int]:
+        """Intersection of two ascending lists in O(len(small) * log(len(large)))"""
+        out = []
+        lo = 0
+        n = len(large)
+        for row in small:
+            lo = bisect_left(large, row, lo)
+            if lo == n:
+                break
+            if large[lo] == row:
+                out.append(row)
+        return out
@@ -0,0 +1,61 @@
+from __future__ import annotations
+from typing import Any, Iterable
+
+class IntervalTree:
+    """
+    Centered interval tree over half-open intervals [start, end), each carrying a value.
+    at(t) returns the values of intervals containing t in O(log n + k) for k results.
+
+    Each node keeps the intervals containing its center point twice, by ascending start and by
+    descending end; intervals entirely before or after the center go to the left or right child.
+    """
+    def __init__(self, intervals: Iterable[tuple[float, float, Any]]) -> None:
+        intervals = [i for i in intervals if i[0] < i[1]]
+        self._size = len(intervals)
+        self._root = self._build(intervals)
+
+    def _build(self, intervals: list[tuple[float, float, Any]]) -> list | None:
+        if not intervals:
+            return None
+        # the median start: the interval starting there contains it, so every child is smaller
+        starts = sorted(i[0] for i in intervals)
+        center = starts[len(starts) // 2]
+
+        left, right, here = list(), list(), list()
+        for i in intervals:
+            if i[1] <= center:
+                left.append(i)
+            elif i[0] > center:
+                right.append(i)
+            else:
+                here.append(i)
+
+        # node: [center, by start, by end descending, left, right]
+        return [center,
+            sorted(here, key=lambda i: i[0]),
+            sorted(here, key=lambda i: i[1], reverse=True),
+            self._build(left),
+            self._build(right)]
+
+    def __len__(self):
+        return self._size
+
+    def at(self, t: float) -> list[Any]:
+        """Values of the intervals with start <= t < end, in no particular order"""
+        out = list()
+        node = self._root
+        while node is not None:
+            center, by_start, by_end, left, right = node
+            if t < center:
+                for start, _, value in by_start:
+                    if start > t:
+                        break
+                    out.append(value)
+                node = left
+            else:
+                for _, end, value in by_end:
+                    if end <= t:
+                        break
+                    out.append(value)
+                node = right
+        return out
@@ -1,40 +1,132 @@
 from __future__ import annotations
-from typing import Any
+from typing import Any, Iterable
 
 import json
+import heapq
+from bisect import bisect_right
+from dataclasses import dataclass
 
 from report.enums import Encounter
 from report.data import Event, EventList
+from report.queries import Q_AURAS, Q_COMBATANT_INFO
+from report.intervals import IntervalTree
 
 def require_auras(func):
     '''Decorator that gets auras for a fight if needed before the function'''
     def ensured(*args, **kwargs):
         self = args[0]
         event = args[1]
-        fight_id = event.fight
-        if fight_id not in self.auras:
-            fight = self._report.fight(fight_id)
-            auras = self._fetch_combatant_info(fight) + \
-                self._fetch_auras(fight)
-
-            # with open('test.json', 'w') as f:
-            #     auras.named().write(f)
-
-            self.auras[fight_id] = reversed(auras)
+        self._load(event.fight)
         return func(*args, **kwargs)
     return ensured
 
+@dataclass(frozen=True)
+class Aura:
+    """An aura on a target: its last apply (None if it was on before the log), stacks and last refresh"""
+    source: int
+    stacks: int
+    applied: Event | None
+    refreshed: int
+
+class AuraState:
+    """
+    Aura state of a fight, built incrementally from aura events in time order: applies, removes,
+    stack changes and refreshes, keyed by (target, ability).
+    Every CHECKPOINT events a snapshot is kept, so the state at any time is the nearest snapshot
+    before it plus at most CHECKPOINT events replayed. Auras are immutable, so snapshots are shallow copies.
+    """
+    CHECKPOINT = 256
+
+    def __init__(self, events: Iterable[Event]=(), checkpoint: int=None) -> None:
+        self.checkpoint = checkpoint or self.CHECKPOINT
+        self.state = dict() # (target, ability): Aura, after all events fed
+        self._events = list()
+        self._times = list()
+        self._snapshots = [dict()] # state before events[i * checkpoint]
+        for e in events:
+            self.feed(e)
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def feed(self, event: Event) -> None:
+        """Adds the next event, which can't be before the last"""
+        if self._times and event.time < self._times[-1]:
+            raise ValueError(f'Aura event at {event.time} is before the last at {self._times[-1]}')
+        self._step(self.state, event)
+        self._events.append(event)
+        self._times.append(event.time)
+        if len(self._events) % self.checkpoint == 0:
+            self._snapshots.append(dict(self.state))
+
+    @staticmethod
+    def _step(state: dict[tuple[int, int], Aura], e: Event) -> None:
+        k = (e.target, e.abilityGameID)
+        current = state.get(k)
+        match e.type_:
+            case 'applybuff' | 'applydebuff':
+                state[k] = Aura(e.source, getattr(e, 'stacks', getattr(e, 'stack', 1)), e, e.time)
+            case 'removebuff' | 'removedebuff':
+                state.pop(k, None)
+            case 'applybuffstack' | 'applydebuffstack' | 'removebuffstack' | 'removedebuffstack':
+                stacks = getattr(e, 'stack', getattr(e, 'stacks', 1))
+                if current is None:
+                    state[k] = Aura(e.source, stacks, None, e.time)
+                else:
+                    state[k] = Aura(current.source, stacks, current.applied, current.refreshed)
+            case 'refreshbuff' | 'refreshdebuff':
+                if current is None:
+                    state[k] = Aura(e.source, 1, None, e.time)
+                else:
+                    state[k] = Aura(e.source, current.stacks, current.applied, e.time)
+
+    def at(self, time: int) -> dict[tuple[int, int], Aura]:
+        """State after every event at or before time"""
+        n = bisect_right(self._times, time)
+        if n == len(self._events):
+            return dict(self.state)
+        i = n // self.checkpoint
+        state = dict(self._snapshots[i])
+        for e in self._events[i * self.checkpoint:n]:
+            self._step(state, e)
+        return state
+
 class AuraModel:
     """Outputs active buffs/debuffs"""
     def __init__(self, report: Report):
         self.code = report.code
         self._report = report
         self.auras = dict() # fightID: aura mapping
+        self.intervals = dict() # fightID: IntervalTree of (order, apply event), see _build_intervals
+        self.window_ends = dict() # fightID: end time of each apply event, see _window_ends
+        self.states = dict() # fightID: AuraState, see state_at
         self.APPLIES = ['applybuff','applydebuff']
+        self.REMOVES = ['removebuff','removedebuff']
+        self.TYPES = self.APPLIES + self.REMOVES + [
+            'applybuffstack','applydebuffstack','removebuffstack','removedebuffstack',
+            'refreshbuff','refreshdebuff']
+
+    def _load(self, fight_id: int) -> None:
+        """Gets auras for a fight if needed"""
+        if fight_id not in self.auras:
+            fight = self._report.fight(fight_id)
+            auras = self._fetch_combatant_info(fight) + \
+                self._fetch_auras(fight)
+
+            # with open('test.json', 'w') as f:
+            #     auras.named().write(f)
+
+            self.auras[fight_id] = reversed(auras)
+            self.intervals[fight_id] = self._build_intervals(self.auras[fight_id])
 
     def _fetch_combatant_info(self, fight: Fight) -> EventList:
         """convert prepull buffs into apply events"""
-        combatant_info = self._report.events(fight.i).types("combatantinfo")
+        if fight.i in self._report._events:
+            combatant_info = self._report.events(fight.i).types("combatantinfo")
+        else:
+            res = self._report._client.q(Q_COMBATANT_INFO, self._params(fight, fight.start_time))
+            combatant_info = map(Event, res['reportData']['report']['info']['data'])
+
         apply_events = list()
         for combatant in combatant_info:
             for aura in combatant.auras:
@@ -47,34 +139,84 @@ class AuraModel:
                     'fight': fight.i,
                     'abilityGameID': aura['ability'],
                     'stacks': aura['stacks'],
-                    'duration': fight.end_time-fight.start_time
                 }))
         return EventList(apply_events, self._report)
 
     def _fetch_auras(self, fight: Fight) -> EventList:
-        return self._report.events(fight.i).types([
-            'applybuff','applydebuff','removebuff','removedebuff'])
+        """
+        Apply and remove events of the fight. Taken from the fight's events if they are loaded,
+        otherwise fetched with Q_AURAS, which sends only these events
+        """
+        if fight.i in self._report._events:
+            return self._report.events(fight.i).types(self.TYPES)
 
-    @require_auras
-    def applied_at(self, event: Event) -> EventList:
-        """All auras active on all entities at the time of an event, returning the list of apply events"""
-        auras = self.auras[event.fight] # auras is in reversed chronological order
+        data = list()
+        start_time = fight.start_time
+        while start_time is not None:
+            res = self._report._client.q(Q_AURAS, self._params(fight, start_time))
+            page = res['reportData']['report']['auras']
+            data += page['data']
+            start_time = page['nextPageTimestamp']
+        return EventList([*map(Event, data)], self._report)
 
-        # get all preceding events
-        auras = auras.before(event)
+    def _params(self, fight: Fight, start_time: int) -> dict:
+        return {
+            'reportCode': self.code,
+            'startTime': start_time,
+            'endTime': fight.end_time,
+            'fightIDs': [fight.i]}
 
-        # get the first event (last chronologically) for that target/ability
-        seen_auras = set()
-        most_recent = list()
-        for a in auras:
-            if (k:=(a.target, a.abilityGameID)) not in seen_auras:
-                seen_auras.add(k)
-                most_recent.append(a)
+    def _build_intervals(self, auras: EventList) -> IntervalTree:
+        return IntervalTree(self._intervals(auras))
 
-        # only apply events
-        
-        most_recent = [e for e in most_recent if e.type_ in self.APPLIES]
-        return EventList(list(reversed(most_recent)), self._report)
+    def _intervals(self, auras: EventList) -> list[tuple[float, float, tuple[int, Event]]]:
+        """
+        Each apply event is active from its time until the next event, apply or remove, with the
+        same target and ability, or for the rest of the fight. auras is in reversed chronological order.
+        Returns (start, end, (order, apply event)) intervals.
+        """
+        last = dict() # (target, ability): (order, apply event) not yet ended
+        intervals = list()
+        for order, e in self._chronological(auras):
+            k = (e.target, e.abilityGameID)
+            if (previous:=last.pop(k, None)) is not None:
+                intervals.append((previous[1].time, e.time, previous))
+            if e.type_ in self.APPLIES:
+                last[k] = (order, e)
+        intervals += [(e.time, float('inf'), (order, e)) for order, e in last.values()]
+        return intervals
+
+    def _chronological(self, auras: EventList) -> list[tuple[int, Event]]:
+        """
+        (order, event) of the apply and remove events of reversed auras by time; stack changes and
+        refreshes don't start or end an aura. order is the position in chronological order, ties stay in it
+        """
+        windowing = set(self.APPLIES + self.REMOVES)
+        return sorted(((order, e) for order, e in enumerate(reversed(auras.to_list())) if e.type_ in windowing),
+            key=lambda pair: pair[1].time)
+
+    def _state(self, fight_id: int) -> AuraState:
+        self._load(fight_id)
+        if (state:=self.states.get(fight_id)) is None:
+            state = AuraState(e for _, e in sorted(enumerate(reversed(self.auras[fight_id].to_list())),
+                key=lambda pair: pair[1].time))
+            self.states[fight_id] = state
+        return state
+
+    def state_at(self, event: Event) -> dict[tuple[int, int], Aura]:
+        """Auras on all entities at the time of an event, with stacks, as {(target, ability id): Aura}"""
+        return self._state(event.fight).at(event.time)
+
+    def stacks_at(self, event: Event, target: int, ability_id: int) -> int:
+        """Stacks of an aura on a target at the time of an event, 0 if it isn't on"""
+        aura = self.state_at(event).get((target, ability_id))
+        return 0 if aura is None else aura.stacks
+
+    @require_auras
+    def applied_at(self, event: Event) -> EventList:
+        """All auras active on all entities at the time of an event, returning the list of apply events"""
+        active = sorted(self.intervals[event.fight].at(event.time), key=lambda pair: pair[0])
+        return EventList([e for _, e in active], self._report)
 
     def active_at(self, event: Event, *, named=False) -> dict(int, list[int]) | dict(str, list[str]):
         """All auras active on all entities at the time of an event, returning an actor.id:list[ability.id] dict"""
@@ -88,6 +230,87 @@ class AuraModel:
 
         return ret
 
+    def active_at_many(self, events: Iterable[Event], *, named=False) -> list[dict(int, list[int])] | list[dict(str, list[str])]:
+        """
+        active_at for many events, in their order. Each fight's aura events are swept once with
+        the events' times sorted, so M events of a fight with n aura events cost O(n + M*k) for
+        k active auras. Names are resolved once per actor and ability.
+        """
+        events = list(events)
+        ret = [None] * len(events)
+        by_fight = dict() # fightID: list of indexes into events
+        for i, e in enumerate(events):
+            by_fight.setdefault(e.fight, list()).append(i)
+
+        for fight_id, indexes in by_fight.items():
+            self._load(fight_id)
+            indexes.sort(key=lambda i: events[i].time)
+            ordered = self._chronological(self.auras[fight_id])
+            active = dict() # (target, ability): (order, apply event)
+            n = 0
+            for i in indexes:
+                time = events[i].time
+                while n < len(ordered) and ordered[n][1].time <= time:
+                    order, e = ordered[n]
+                    k = (e.target, e.abilityGameID)
+                    active.pop(k, None)
+                    if e.type_ in self.APPLIES:
+                        active[k] = (order, e)
+                    n += 1
+                state = dict()
+                for _, e in sorted(active.values(), key=lambda pair: pair[0]):
+                    state.setdefault(e.target, list()).append(e.abilityGameID)
+                ret[i] = state
+
+        if named is False:
+            return ret
+
+        r = self._report
+        actor_names, ability_names = dict(), dict()
+        for state in ret:
+            for target, ability_ids in state.items():
+                if target not in actor_names:
+                    actor_names[target] = r.get_actor(target).name
+                for a in ability_ids:
+                    if a not in ability_names:
+                        ability_names[a] = r.get_ability(a)
+
+        named_states = list()
+        for state in ret:
+            named_state = dict()
+            for target, ability_ids in state.items():
+                named_state.setdefault(actor_names[target], list()).extend(ability_names[a] for a in ability_ids)
+            named_states.append(named_state)
+        return named_states
+
+    def coverage(self, fight_id: int, aura_list: list[str | int], players: list[int]=None, *,
+        resolution: int=100) -> Coverage:
+        """
+        Coverage of auras on players over a fight, in bins of resolution ms. Auras are names,
+        which cover all abilities of the name, or ability ids. Players default to the fight's.
+        Requires numpy. e.g. the share of P5 with Kerachole on everyone:
+        am.coverage(fight_id, ['Kerachole']).between(p5_start, p5_end).all_covered_uptime('Kerachole')
+        """
+        from report.coverage import Coverage
+
+        self._load(fight_id)
+        fight = self._report.fight(fight_id)
+        players = list(fight.players if players is None else players)
+        rows = {p: i for i, p in enumerate(players)}
+        columns = dict() # ability id: [column]
+        for column, a in enumerate(aura_list):
+            for ability_id in (self._report.get_ability(a) if isinstance(a, str) else [a]):
+                columns.setdefault(ability_id, list()).append(column)
+
+        intervals = dict() # (row, column): [(start, end)]
+        for start, end, (_, e) in self._intervals(self.auras[fight_id]):
+            if (row:=rows.get(e.target)) is None:
+                continue
+            for column in columns.get(e.abilityGameID, []):
+                intervals.setdefault((row, column), list()).append((start, end))
+        return Coverage.from_intervals(intervals, players, list(aura_list),
+            fight.start_time, fight.end_time, resolution)
+
     def aura(self, aura_list: str|int|list[int|str], fight_id: int) -> EventList:
         """All occurences of an aura, returning the list of apply events"""
         # make it a list
@@ -106,6 +329,7 @@ class AuraModel:
         else:
             ability_ids = aura_list
 
+        self._load(fight_id)
         auras = self.auras[fight_id]
         auras = [e for e in auras if e.abilityGameID in ability_ids and e.type_ in self.APPLIES]
         return EventList(list(reversed(auras)), self._report)
@@ -118,8 +342,54 @@ class AuraModel:
 
     def gcds(self, aura_event: Event) -> EventList:
         """list of actions used during an aura"""
-        pass
+        return self.gcds_many([aura_event])[0]
+
+    def gcds_many(self, aura_events: Iterable[Event]) -> list[EventList]:
+        """
+        Casts by the target of each aura, from its apply event until it ended, in the order of
+        aura_events. The casts of all their fights are fetched at once and joined with the
+        windows in one sorted merge per fight, O((n + m) log m + k) for n casts, m windows and k results.
+        """
+        aura_events = list(aura_events)
+        ret = [list() for _ in aura_events]
+        windows = dict() # fightID: [(start, end, index into aura_events)]
+        for i, e in enumerate(aura_events):
+            ends = self._window_ends(e.fight)
+            end = ends.get((e.target, e.abilityGameID, e.time), e.time)
+            windows.setdefault(e.fight, list()).append((e.time, end, i))
 
+        casts_by_fight = {fight_id: list() for fight_id in windows}
+        if windows:
+            for c in self._report.types('cast', list(windows)):
+                casts_by_fight[c.fight].append(c)
 
+        for fight_id, fight_windows in windows.items():
+            fight_windows.sort()
+            casts = casts_by_fight[fight_id]
+            open_windows = dict() # actor id: heap of (end, index) of windows that have started
+            w = 0
+            for c in casts:
+                # windows starting at or before the cast
+                while w < len(fight_windows) and fight_windows[w][0] <= c.time:
+                    start, end, i = fight_windows[w]
+                    heapq.heappush(open_windows.setdefault(aura_events[i].target, list()), (end, i))
+                    w += 1
+                if (heap:=open_windows.get(c.source)) is None:
+                    continue
+                while heap and heap[0][0] <= c.time:
+                    heapq.heappop(heap)
+                for _, i in heap:
+                    ret[i].append(c)
 
+        return [EventList(ls, self._report) for ls in ret]
 
+    def _window_ends(self, fight_id: int) -> dict[tuple[int, int, int], float]:
+        """(target, ability, time) of each apply event: when it ended, see _intervals"""
+        self._load(fight_id)
+        if (ends:=self.window_ends.get(fight_id)) is None:
+            ends = dict()
+            for start, end, (_, e) in self._intervals(self.auras[fight_id]):
+                k = (e.target, e.abilityGameID, start)
+                ends[k] = max(end, ends.get(k, end))
+            self.window_ends[fight_id] = ends
+        return ends
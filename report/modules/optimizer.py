@@ -0,0 +1,186 @@
+from __future__ import annotations
+from typing import Iterable
+
+from collections import deque
+from dataclasses import dataclass, field
+
+import numpy as np
+
+@dataclass(frozen=True)
+class Buff:
+    """A raid buff and its cooldown constraints. Times are in ms"""
+    name: str
+    duration: int
+    cooldown: int
+    bonus: float = 1.0 # weight of the damage inside a window, e.g. 0.05 for a 5% buff
+    hold: int | None = None # how long it may be held once off cooldown, None for no limit
+
+@dataclass
+class BuffPlan:
+    """Best use times of a player's buff in a fight"""
+    player: int
+    buff: Buff
+    times: list[int] = field(default_factory=list)
+    damage: float = 0 # damage inside the windows, times the bonus
+
+class DamageProfile:
+    """
+    Damage of a fight in bins of resolution ms from start_time, with prefix sums.
+    A buff window is cut short at the start of the next phase.
+    """
+    def __init__(self, times: Iterable[int], amounts: Iterable[float], start_time: int, end_time: int,
+        resolution: int=100, phase_starts: Iterable[int]=()) -> None:
+        self.start_time = start_time
+        self.resolution = resolution
+        self.bins = max(1, -(-(end_time - start_time) // resolution))
+
+        bins = (np.fromiter(times, dtype=np.int64) - start_time) // resolution
+        amounts = np.fromiter(amounts, dtype=np.float64)
+        keep = (bins >= 0) & (bins < self.bins)
+        self.damage = np.bincount(bins[keep], weights=amounts[keep], minlength=self.bins)
+        self.prefix = np.concatenate(([0.0], np.cumsum(self.damage)))
+
+        # phase_end[b]: first bin of the phase after the one holding bin b
+        starts = sorted({self.bin(t) for t in phase_starts} - {0})
+        starts = np.array([s for s in starts if 0 < s < self.bins] + [self.bins], dtype=np.int64)
+        self.phase_end = starts[np.searchsorted(starts, np.arange(self.bins), side='right')]
+
+    def bin(self, time: int) -> int:
+        return max(0, (time - self.start_time) // self.resolution)
+
+    def time(self, bin: int) -> int:
+        return self.start_time + bin * self.resolution
+
+    def windows(self, duration: int) -> np.ndarray:
+        """Damage inside a window of duration ms starting at each bin"""
+        starts = np.arange(self.bins)
+        ends = np.minimum(starts + -(-duration // self.resolution), self.phase_end)
+        return self.prefix[ends] - self.prefix[starts]
+
+    def between(self, start_time: int, end_time: int) -> float:
+        """Damage from start_time up to before end_time, to bin resolution"""
+        start = min(self.bin(start_time), self.bins)
+        end = min(max(start, self.bin(end_time)), self.bins)
+        return float(self.prefix[end] - self.prefix[start])
+
+def best_uses(values: np.ndarray, cooldown: int, hold: int | None=None) -> tuple[float, list[int]]:
+    """
+    Uses, as indexes into values, maximizing their total: each at least cooldown after the last,
+    and if hold is given, at most cooldown + hold after it, and the first at most hold in.
+    Values are not negative, so using more never loses.
+
+    best[s], the most from uses starting with one at s, is values[s] plus the largest best[] in
+    [s + cooldown, s + cooldown + hold]. Going backwards that range slides down one at a time,
+    so a deque keeps its maximum: O(n) for any cooldown and hold.
+    """
+    if hold is None:
+        return _best_uses_unheld(np.asarray(values, dtype=np.float64), max(1, cooldown))
+
+    values = [float(v) for v in values]
+    n = len(values)
+    cooldown = max(1, cooldown)
+    best = [0.0] * n
+    after = [-1] * n # next use after a use at s
+    window = deque() # indexes in [s + cooldown, s + cooldown + hold], best[] strictly increasing to the right, so the max is window[-1]
+    for s in range(n - 1, -1, -1):
+        if (i:=s + cooldown) < n:
+            while window and best[window[0]] <= best[i]:
+                window.popleft()
+            window.appendleft(i)
+        while window and window[-1] > s + cooldown + hold:
+            window.pop()
+        best[s] = values[s]
+        if window and best[window[-1]] > 0:
+            best[s] += best[window[-1]]
+            after[s] = window[-1]
+
+    if n == 0:
+        return 0.0, list()
+    first = max(range(min(n, hold + 1)), key=lambda s: (best[s], -s))
+    return _uses(best, after, first)
+
+def _best_uses_unheld(values: np.ndarray, cooldown: int) -> tuple[float, list[int]]:
+    """
+    best_uses without a hold: the next use is anywhere from cooldown on, so best[s] only needs
+    the suffix maximum of best[] from s + cooldown. Those are all in later blocks of cooldown
+    values, so each block is done at once with numpy, going backwards.
+    """
+    n = len(values)
+    if n == 0:
+        return 0.0, list()
+    best = np.zeros(n)
+    after = np.full(n, -1, dtype=np.int64)
+    suffix = np.zeros(n + 1) # suffix[i]: max of best[i:]
+    suffix_at = np.full(n + 1, -1, dtype=np.int64) # its earliest index
+    for start in range(((n - 1) // cooldown) * cooldown, -1, -cooldown):
+        end = min(n, start + cooldown)
+        s = np.arange(start, end)
+        nxt = np.minimum(s + cooldown, n)
+        best[start:end] = values[start:end] + suffix[nxt]
+        after[start:end] = np.where(suffix[nxt] > 0, suffix_at[nxt], -1)
+
+        # suffix maxima of the block, backwards, with the earliest index of each on ties
+        backwards = best[start:end][::-1]
+        running = np.maximum.accumulate(backwards)
+        at = np.maximum.accumulate(np.where(backwards == running, np.arange(end - start), 0))
+        running, at = running[::-1], (end - 1 - at)[::-1]
+        later = suffix[end] > running
+        suffix[start:end] = np.where(later, suffix[end], running)
+        suffix_at[start:end] = np.where(later, suffix_at[end], at)
+
+    return _uses(best.tolist(), after.tolist(), int(suffix_at[0]))
+
+def _uses(best: list[float], after: list[int], first: int) -> tuple[float, list[int]]:
+    """Total and uses from the first, following after[]"""
+    if best[first] <= 0:
+        return 0.0, list()
+    uses = list()
+    s = first
+    while s != -1:
+        uses.append(s)
+        s = after[s]
+    return best[first], uses
+
+class BuffOptimizer:
+    """
+    Best times for raid buffs: each player's buffs are placed to hold the most damage inside
+    their windows, given their cooldowns. Damage is players' damage events, binned.
+    Buffs are independent, so the total is the sum of each buff's best.
+    """
+    RESOLUTION = 100 # ms per bin
+
+    def __init__(self, report: Report, resolution: int=None) -> None:
+        self._report = report
+        self.resolution = resolution or self.RESOLUTION
+
+    def profile(self, fight_id: int) -> DamageProfile:
+        r = self._report
+        fight = r.fight(fight_id)
+        players = set(fight.players)
+        damage = r.events(fight_id).types('damage').filter(lambda e: e.source in players)
+        damage = [e for e in damage if hasattr(e, 'amount')]
+        phase_starts = list()
+        if r.pm is not None:
+            phase_starts = [e.time for e in r.pm.timeline(fight_id)]
+        return DamageProfile((e.time for e in damage), (e.amount for e in damage),
+            fight.start_time, fight.end_time, self.resolution, phase_starts)
+
+    def optimize(self, fight_id: int, buffs: dict[int, list[Buff]], profile: DamageProfile=None) -> list[BuffPlan]:
+        """Best plan for each buff of each player, buffs as {player id: [Buff]}"""
+        profile = profile or self.profile(fight_id)
+        windows = dict() # duration: window damage, shared by buffs of the same length
+        plans = list()
+        for player, player_buffs in buffs.items():
+            for buff in player_buffs:
+                if buff.duration not in windows:
+                    windows[buff.duration] = profile.windows(buff.duration)
+                hold = None if buff.hold is None else buff.hold // self.resolution
+                damage, uses = best_uses(windows[buff.duration], -(-buff.cooldown // self.resolution), hold)
+                plans.append(BuffPlan(player, buff, [profile.time(b) for b in uses], damage * buff.bonus))
+        return plans
+
+    def optimize_all(self, buffs: dict[int, list[Buff]], fight_ids: list[int]=None) -> dict[int, list[BuffPlan]]:
+        """optimize for every fight of the report, or the ones given"""
+        if fight_ids is None:
+            fight_ids = list(self._report._fights)
+        return {i: self.optimize(i, buffs) for i in fight_ids}
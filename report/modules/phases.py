@@ -12,6 +12,7 @@ query Timeline ($reportCode: String!, $encounterID: Int!, $startTime: Float, $en
     rateLimitData {
         limitPerHour
         pointsSpentThisHour
+        pointsResetIn
     }
     reportData {
         report(code: $reportCode) {
@@ -19,14 +20,14 @@ query Timeline ($reportCode: String!, $encounterID: Int!, $startTime: Float, $en
                 encounterID: $encounterID,
                 startTime: $startTime, endTime: $endTime) {
                 data
-                # nextPageTimestamp
+                nextPageTimestamp
             }
             targetable: events(hostilityType: Enemies, limit: 10000,
                 encounterID: $encounterID,
                 filterExpression: "type='targetabilityupdate'",
                 startTime: $startTime, endTime: $endTime) {
                 data
-                # nextPageTimestamp
+                nextPageTimestamp
             }
         }
     }
@@ -67,10 +68,67 @@ class PhaseModel:
         # dict[fight_id: timeline], populated by _build()
         self.timelines = dict() 
 
+        # dict[fight_id: (deaths, targetable)], populated by _fetch_timeline_events()
+        self._timeline_events = dict()
+        self._timeline_until = None # end time of the range fetched
+
+    def _fetch_timeline_events(self) -> None:
+        """
+        Enemy deaths and targetability updates of every fight of the encounter, fetched together
+        with Q_TIMELINE. Each alias pages separately, so the next request starts at the earlier
+        of the two page starts and events already seen are skipped.
+        """
+        r = self._report
+        start_time = r.first_fight().start_time
+        end_time = r.last_fight().end_time
+        cursors = {'deaths': start_time, 'targetable': start_time} # alias: start of its next page
+        data = {'deaths': list(), 'targetable': list()}
+        while cursors:
+            res = r._client.q(Q_TIMELINE, {
+                'reportCode': r.code,
+                'encounterID': r.encounter.value,
+                'startTime': min(cursors.values()),
+                'endTime': end_time})
+            report = res['reportData']['report']
+            for alias, cursor in list(cursors.items()):
+                page = report[alias]
+                data[alias] += [e for e in page['data'] if e['timestamp'] >= cursor]
+                if page['nextPageTimestamp'] is None:
+                    del cursors[alias]
+                else:
+                    cursors[alias] = max(cursor, page['nextPageTimestamp'])
+
+        by_fight = {i: (list(), list()) for i in r._fights}
+        for i, alias in enumerate(('deaths', 'targetable')):
+            for e in data[alias]:
+                by_fight.setdefault(e['fight'], (list(), list()))[i].append(Event(e))
+        self._timeline_events = {fight_id: (EventList(deaths, r), EventList(targetable, r))
+            for fight_id, (deaths, targetable) in by_fight.items()}
+        self._timeline_until = end_time
+
+    def _timeline_sources(self, fight: Fight) -> tuple[EventList, EventList]:
+        """
+        (deaths, targetability updates) of a fight: from its events if loaded,
+        otherwise from the batched timeline query
+        """
+        if fight.i in self._report._events:
+            events = self._report.events(fight.i)
+            return events.types('death'), events.types('targetabilityupdate')
+        if self._timeline_until is None or fight.end_time > self._timeline_until:
+            self._fetch_timeline_events()
+        empty = EventList(list(), self._report)
+        return self._timeline_events.get(fight.i, (empty, empty))
+
     def _build_all(self) -> None:
         for fight_id in self._report._fights.keys():
             self.timelines[fight_id] = self._build(fight_id)
 
+    def timeline(self, fight_id: int) -> EventList:
+        """The timeline of a fight, building it if needed"""
+        if fight_id not in self.timelines:
+            self.timelines[fight_id] = self._build(fight_id)
+        return self.timelines[fight_id]
+
     @require_timeline
     def phase(self, event: Event) -> int:
         """Returns the phase number of the event"""
@@ -142,12 +200,12 @@ class PhaseModelDsu(PhaseModel):
             return EventList(timeline, self._report)
 
         # Events for this fight is only based on deaths and boss targetables.
-        deaths = self._report.events(fight.i).types('death').to_npcs()
-        targetable = self._report.events(fight.i).types("targetabilityupdate")\
-            .filter(lambda e: e.targetable==True)
+        deaths, targetable = self._timeline_sources(fight)
+        deaths = deaths.to_npcs()
+        targetable = targetable.filter(lambda e: e.targetable==True)
 
         # Join both types of events and order chronologically
-        phase_events = (deaths + targetable).sort_time()
+        phase_events = EventList.merge(deaths, targetable)
         
         # timeline = list()
         # special P1 -> P2 case
@@ -193,8 +251,7 @@ class PhaseModelTea(PhaseModel):
         targetable = events.types('targetabilityupdate').to(['Brute Justice', 'Cruise Chaser', 'Alexander Prime'])
         cutscene_end = events.ability('Down for the Count').types('removedebuff')[:1]
 
-        phase_events = first_hawk_blaster+targetable+cutscene_end
-        phase_events.sort_time()
+        phase_events = EventList.merge(first_hawk_blaster, targetable, cutscene_end)
 
         timeline = [phase_events[i] for i in EVENT_INDEX if i < len(phase_events)]
         return EventList(timeline, self._report)
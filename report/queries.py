@@ -3,6 +3,7 @@ query MasterData ($reportCode: String!) {
     rateLimitData {
         limitPerHour
         pointsSpentThisHour
+        pointsResetIn
     }
     reportData {
         report(code: $reportCode) {
@@ -50,6 +51,7 @@ query Fights ($reportCode: String!, $encounterID: Int, $fightIDs: [Int]) {
     rateLimitData {
         limitPerHour
         pointsSpentThisHour
+        pointsResetIn
     }
     reportData {
         report(code: $reportCode) {
@@ -74,6 +76,7 @@ query Events ($reportCode: String!, $encounterID: Int, $startTime: Float, $endTi
     rateLimitData {
         limitPerHour
         pointsSpentThisHour
+        pointsResetIn
     }
     reportData {
         report(code: $reportCode) {
@@ -95,6 +98,7 @@ query Abilities ($page: Int){
     rateLimitData {
         limitPerHour
         pointsSpentThisHour
+        pointsResetIn
     }
     gameData {
         abilities(limit: 100, page: $page) {
@@ -115,12 +119,13 @@ query Auras ($reportCode: String!, $startTime: Float, $endTime: Float, $fightIDs
     rateLimitData {
         limitPerHour
         pointsSpentThisHour
+        pointsResetIn
     }
     reportData {
         report(code: $reportCode) {
             auras: events(limit: 10000, # hostilityType: Enemies,
                 startTime: $startTime, endTime: $endTime,
-                filterExpression: "inCategory('auras')=true AND type in ('applybuff','applydebuff','removebuff','removedebuff')",
+                filterExpression: "inCategory('auras')=true AND type in ('applybuff','applydebuff','removebuff','removedebuff','applybuffstack','applydebuffstack','removebuffstack','removedebuffstack','refreshbuff','refreshdebuff')",
                 fightIDs: $fightIDs) {
                 data
                 nextPageTimestamp
@@ -135,6 +140,7 @@ query CombatantInfo ($reportCode: String!, $startTime: Float, $endTime: Float, $
     rateLimitData {
         limitPerHour
         pointsSpentThisHour
+        pointsResetIn
     }
     reportData {
         report(code: $reportCode) {
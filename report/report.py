@@ -1,21 +1,31 @@
 from __future__ import annotations
-from typing import Any
+from typing import Any, Iterable
 
 # standard
 import json
-from math import floor
+from math import floor, ceil
 
 # custom
 from report.enums import Encounter, Platform, Vod
 from report.queries import Q_MASTER_DATA, Q_FIGHTS, Q_EVENTS, Q_ABILITIES
-from report.data import Event, EventList, Fight, Ability, Actor
+from report.data import Event, EventList, ChainedEventList, Fight, Ability, Actor
+from report.filters import FilterError
 from report.modules.phases import PhaseModelDsu, PhaseModelTea
 from report.modules.aura import AuraModel
+from client.scheduler import Priority
 
 class Report:
     """Report for one type of encounter"""
-    def __init__(self, code: str | Vod, client: 'FFClient', encounter: Encounter) -> None:
+    WINDOW_EVENTS = 8000 # target events per window when fetching windowed, under the 10000 per page
+    MAX_WINDOWS = 16 # per range and round
+
+    def __init__(self, code: str | Vod, client: 'FFClient', encounter: Encounter, *,
+        columnar: bool=False, windowed: bool=False) -> None:
         self._client = client
+        self.columnar = columnar # store fight events in numpy columns
+        # split long fetches into time windows fetched concurrently. Opt-in, and only used with a
+        # client whose q_many is concurrent (AsyncFFClient): serially, windows only add requests
+        self.windowed = windowed and getattr(client, 'CONCURRENT', False)
         if isinstance(code, Vod):
             self.code = code.code
             self.set_vod(code)
@@ -29,6 +39,7 @@ class Report:
         self._fetch_master_data()
         self._fights = self._fetch_all_fights() # {fight id: fight}
         self._events = dict()
+        self._density = dict() # filter expression: events per ms, see _fetch_ranges
 
     def _load_phase_model(self, encounter: Encounter):
         self.encounter = encounter
@@ -54,6 +65,23 @@ class Report:
 
         self.actors = [Actor(a) for a in report['masterData']['actors']]
         self.abilities = [Ability(a) for a in report['masterData']['abilities']]
+        self._build_lookups()
+
+    def _build_lookups(self) -> None:
+        """id/name lookup tables for actors and abilities"""
+        self._actor_by_id = dict() # id: Actor
+        self._actor_ids_by_name = dict() # name: [id]
+        self._actor_ids_by_type = dict() # type_: [id]
+        for a in self.actors:
+            self._actor_by_id[a.i] = a
+            self._actor_ids_by_name.setdefault(a.name, []).append(a.i)
+            self._actor_ids_by_type.setdefault(a.type_, []).append(a.i)
+
+        self._ability_by_id = dict() # id: Ability
+        self._ability_ids_by_name = dict() # name: [id]
+        for a in self.abilities:
+            self._ability_by_id[a.i] = a
+            self._ability_ids_by_name.setdefault(a.name, []).append(a.i)
 
     def _fetch_all_fights(self) -> list(Fight):
         res = self._client.q(Q_FIGHTS, {
@@ -96,53 +124,129 @@ class Report:
 
     def get_actor(self, name_or_id: str | int) -> list[Actor] | Actor:
         if isinstance(name_or_id, str):
-            return [a for a in self.actors if a.name==name_or_id]
+            return [self._actor_by_id[i] for i in self.get_actor_ids(name_or_id)]
         elif isinstance(name_or_id, int):
-            return next(filter(lambda a: a.i==name_or_id, self.actors))
+            return self._actor_by_id[name_or_id]
         else:
             raise TypeError(f'Needs a name or id, got {name_or_id=}')
 
+    def get_actor_name(self, actor_id: int, default: Any=None) -> str:
+        return a.name if (a:=self._actor_by_id.get(actor_id)) else default
+
     def get_actor_ids(self, name: str) -> list[int]:
-        return [a.i for a in self.get_actor(name)]
+        return list(self._actor_ids_by_name.get(name, []))
+
+    def get_actor_ids_of_type(self, type_: str) -> list[int]:
+        """Ids of all actors of a type, e.g. 'Player' or 'NPC'"""
+        return list(self._actor_ids_by_type.get(type_, []))
 
     def get_ability(self, name_or_id: str | int) -> list[int] | str:
         if isinstance(name_or_id, str):
-            return [a.i for a in self.abilities if a.name==name_or_id]
+            return list(self._ability_ids_by_name.get(name_or_id, []))
         elif isinstance(name_or_id, int):
-            return next(filter(lambda a: a.i==name_or_id, self.abilities)).name
+            return self._ability_by_id[name_or_id].name
         else:
             raise TypeError(f'needs str or int, got {name_or_id=}')
 
+    def get_ability_name(self, ability_id: int, default: Any=None) -> str:
+        return a.name if (a:=self._ability_by_id.get(ability_id)) else default
+
+    def actor_names(self, ids: Iterable[int], default: str=None) -> list[str]:
+        """Names for a column of actor ids. Unknown ids become default"""
+        actors = self._actor_by_id
+        return [a.name if (a:=actors.get(i)) else default for i in ids]
+
+    def ability_names(self, ids: Iterable[int], default: str=None) -> list[str]:
+        """Names for a column of ability ids. Unknown ids become default"""
+        abilities = self._ability_by_id
+        return [a.name if (a:=abilities.get(i)) else default for i in ids]
+
     def _fetch_all_events(self, fight_id: int) -> EventList:
-        fight = self.fight(fight_id)
-        start_time = fight.start_time
-        all_events = list()
-        while start_time:
-            res = self._client.q(Q_EVENTS, params={
+        return self._fetch_fights_events([fight_id])[fight_id]
+
+    def _fetch_fights_events(self, fight_ids: list[int], priority: Priority=Priority.INTERACTIVE) -> dict[int, EventList]:
+        """All events of several fights, fetched together (see _fetch_ranges)"""
+        fights = {i: self.fight(i) for i in fight_ids}
+        ranges = {i: ([i], fight.start_time, fight.end_time) for i, fight in fights.items()}
+        all_data = self._fetch_ranges(ranges, priority=priority)
+        return {i: self._to_event_list(data) for i, data in all_data.items()}
+
+    def _fetch_ranges(self, ranges: dict[Any, tuple[list[int], int, int]], filter_expression: str='',
+        priority: Priority=Priority.INTERACTIVE) -> dict[Any, list[dict[str, Any]]]:
+        """
+        Raw events of several (fight ids, start time, end time) ranges.
+        Each round requests the next page of every unfinished range together, so a client with
+        q_many fetches them concurrently. If self.windowed, a range expected to take more than
+        one page is also split into windows of about WINDOW_EVENTS events, from the event density
+        seen so far, which are fetched concurrently too and stitched back in time order.
+        """
+        # window: (range key, start time, end time, whether last in its range)
+        pending = list()
+        for key, (_, start_time, end_time) in ranges.items():
+            pending += self._split_window(key, start_time, end_time, True, filter_expression)
+
+        chunks = {key: list() for key in ranges} # range key: [(start time, events)]
+        while pending:
+            results = self._client.q_many([(Q_EVENTS, {
                 'reportCode': self.code,
                 'encounterID': self.encounter.value,
                 'startTime': start_time,
-                'endTime': fight.end_time,
-                'fightIDs': [fight_id]})
-            events = res['reportData']['report']['events']
-            all_events += [*map(Event, events['data'])]
-            start_time = events['nextPageTimestamp']
-
-        return EventList(all_events, self)
+                'endTime': end_time,
+                'filter': filter_expression,
+                'fightIDs': ranges[key][0]}) for key, start_time, end_time, _ in pending], priority=priority)
+
+            next_pending = list()
+            for (key, start_time, end_time, last), res in zip(pending, results):
+                events = res['reportData']['report']['events']
+                data, next_page = events['data'], events['nextPageTimestamp']
+                if next_page is not None and next_page <= end_time:
+                    # the page holds [start_time, next_page); continue the rest of the window
+                    chunks[key].append((start_time, [e for e in data if e['timestamp'] < next_page]))
+                    self._observe_density(filter_expression, len(data), next_page - start_time)
+                    next_pending += self._split_window(key, next_page, end_time, last, filter_expression)
+                else:
+                    # windows share their boundaries; the next window has the events at end_time
+                    chunks[key].append((start_time, data if last else [e for e in data if e['timestamp'] < end_time]))
+            pending = next_pending
+
+        return {key: [e for _, data in sorted(parts, key=lambda part: part[0]) for e in data]
+            for key, parts in chunks.items()}
+
+    def _split_window(self, key: Any, start_time: int, end_time: int, last: bool,
+        filter_expression: str) -> list[tuple[Any, int, int, bool]]:
+        """Windows covering start_time to end_time, sized by the observed density of events"""
+        density = self._density.get(filter_expression)
+        if not self.windowed or not density:
+            return [(key, start_time, end_time, last)]
+        n = max(1, min(self.MAX_WINDOWS, ceil((end_time - start_time) * density / self.WINDOW_EVENTS)))
+        bounds = [start_time + (end_time - start_time) * i // n for i in range(n)] + [end_time]
+        return [(key, bounds[i], bounds[i+1], last and i == n-1) for i in range(n)]
+
+    def _observe_density(self, filter_expression: str, events: int, duration: int) -> None:
+        """Running average of events per ms in full pages, per filter"""
+        if duration <= 0:
+            return
+        density = events / duration
+        old = self._density.get(filter_expression, density)
+        self._density[filter_expression] = 0.5 * old + 0.5 * density
+
+    def _to_event_list(self, data: list[dict[str, Any]]) -> EventList:
+        """EventList of one fight's raw events, in the report's backend"""
+        if self.columnar:
+            from report.columnar import ColumnarEventList
+            return ColumnarEventList.from_data(data, self)
+        return EventList([*map(Event, data)], self).build_index()
 
     def _fetch_all_events_all_fights(self) -> None:
-        for fight_id in self._fights.keys():
-            if fight_id not in self._events:
-                self._events[fight_id] = self._fetch_all_events(fight_id)
+        missing = [i for i in self._fights.keys() if i not in self._events]
+        if missing:
+            self._events.update(self._fetch_fights_events(missing, Priority.BULK))
 
     def events(self, fight_id: int=None) -> EventList:
         # get all events in report if no fight_id specified
         if fight_id is None:
             self._fetch_all_events_all_fights()
-            ret = EventList(list(), self)
-            for event_list in self._events.values():
-                ret += event_list
-            return ret
+            return ChainedEventList([self._events[i] for i in sorted(self._events)], self)
 
         # if not a valid fight in the report
         if self.fight(fight_id) is None:
@@ -156,27 +260,51 @@ class Report:
         return self._events[fight_id]
 
     def _fetch_events(self, filter_expression: str='', fight_ids: int|list[Int]=[]) -> EventList:
+        """
+        Events of the fights (default all) matching the filter. Fights whose events are loaded are
+        filtered locally when the expression allows it; the rest are fetched in one range from the
+        first of them to the last, so the request skips fights that weren't asked for.
+        """
         if isinstance(fight_ids, int):
             fight_ids = [fight_ids]
-
-        start_time = self.first_fight().start_time
-        all_events = []
-        while start_time:
-            res = self._client.q(Q_EVENTS, params={
-                'reportCode': self.code,
-                'encounterID': self.encounter.value,
-                'startTime': start_time,
-                'endTime': self.last_fight().end_time,
-                'filter': filter_expression,
-                'fightIDs': fight_ids})
-            events = res['reportData']['report']['events']
-            all_events += [*map(Event, events['data'])]
-            start_time = events['nextPageTimestamp']
-
-        return EventList(all_events, self)
-
-    def filter(self, filter_str: str, *args) -> EventList:
-        return self._fetch_events(filter_str, *args)
+        fight_ids = sorted(fight_ids or self._fights, key=lambda i: self.fight(i).start_time)
+
+        parts, remote = self._plan_events(filter_expression, fight_ids)
+        if remote:
+            fights = [self.fight(i) for i in remote]
+            # the fights by id, rather than [] for all, so the client can tell what it covers
+            ranges = {0: (remote, fights[0].start_time, max(f.end_time for f in fights))}
+            by_fight = {i: list() for i in remote}
+            for e in self._fetch_ranges(ranges, filter_expression)[0]:
+                by_fight[e['fight']].append(Event(e))
+            parts.update((i, EventList(ls, self)) for i, ls in by_fight.items())
+
+        events = [parts[i] for i in fight_ids]
+        return events[0] if len(events) == 1 else ChainedEventList(events, self)
+
+    def _plan_events(self, filter_expression: str, fight_ids: list[int]) -> tuple[dict[int, EventList], list[int]]:
+        """({fight id: events} answered from loaded events, [fight ids] to fetch)"""
+        local = dict()
+        remote = list()
+        for i in fight_ids:
+            if i not in self._events:
+                remote.append(i)
+            elif not filter_expression:
+                # a view, so reordering the result doesn't reorder the stored events
+                local[i] = ChainedEventList([self._events[i]], self)
+            else:
+                try:
+                    local[i] = self._events[i].where(filter_expression)
+                except FilterError: # the same for every fight
+                    return dict(), fight_ids
+        return local, remote
+
+    def filter(self, filter_str: str, fight_ids: int|list[int]=[]) -> EventList:
+        """
+        Events matching an FFLogs filter expression. Evaluated locally for fights whose events are
+        loaded, if the expression is supported (see report.filters), otherwise by the server
+        """
+        return self._fetch_events(filter_str, fight_ids)
 
     def deaths(self, *args) -> EventList:
         return self.filter("inCategory('deaths') = true", *args)
@@ -198,7 +326,7 @@ class Report:
         return self.filter(filter_str, *args)
 
     def dummy_downs(self) -> EventList:
-        return self._fetch_events("type='applydebuff' AND target.disposition='friendly' AND ability.name='Damage Down'")
+        return self.filter("type='applydebuff' AND target.disposition='friendly' AND ability.name='Damage Down'")
 
     def print_pull_times(self, *, offset: int=0) -> Report:
         """Print start time for all fights"""
@@ -59,8 +59,7 @@ def p6s():
 
     # casts = events.casts(['Unholy Darkness', 'Dark Ashes']).named()
     # casts.timeline()
-    total = begin + other
-    total.sort_time()
+    total = EventList.merge(begin, other)
 
     total.timeline()
 
@@ -94,8 +93,7 @@ def p7s():
         .named()
     other = events.casts(['Inviolate Winds', 'Chelic Predation', 'Pathogenic Cells']).named()
 
-    total = begin + other
-    total.sort_time()
+    total = EventList.merge(begin, other)
     total.timeline()
     
 p6s()
\ No newline at end of file